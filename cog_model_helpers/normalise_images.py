@@ -0,0 +1,67 @@
+import os
+import uuid
+from PIL import Image, ImageOps
+
+IMAGE_FILE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".webp"]
+FORMAT_CHOICES = ["webp", "png"]
+DEFAULT_FORMAT = "webp"
+DEFAULT_QUALITY = 95
+# Longest side inputs are scaled down to. 0 leaves the resolution alone.
+DEFAULT_MAX_RESOLUTION = int(os.getenv("INPUT_MAX_RESOLUTION", "0"))
+EXIF_ORIENTATION_TAG = 0x0112
+
+
+def needs_normalising(image, max_resolution):
+    rotated = image.getexif().get(EXIF_ORIENTATION_TAG, 1) != 1
+    too_large = max_resolution > 0 and max(image.size) > max_resolution
+    return rotated or too_large
+
+
+def normalise_image_file(
+    path,
+    max_resolution=DEFAULT_MAX_RESOLUTION,
+    output_format=DEFAULT_FORMAT,
+    quality=DEFAULT_QUALITY,
+):
+    # Applies the EXIF orientation and scales the image down so LoadImage and
+    # face detection never work on more pixels than the workflow uses. The
+    # file keeps its name, because that is what the workflow refers to;
+    # LoadImage detects the format from the content.
+    with Image.open(path) as image:
+        if not needs_normalising(image, max_resolution):
+            return False
+
+        original_size = image.size
+        image = ImageOps.exif_transpose(image)
+        if max_resolution > 0:
+            image.thumbnail((max_resolution, max_resolution), Image.LANCZOS)
+        if image.mode not in ["RGB", "RGBA"]:
+            has_alpha = "A" in image.mode or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+        # Staged inputs can be hardlinks to the caller's file, so write a new
+        # file and swap it in rather than overwriting in place
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        if output_format == "png":
+            image.save(temp_path, format="PNG", compress_level=1)
+        else:
+            image.save(temp_path, format="WEBP", quality=quality, method=4)
+
+    os.replace(temp_path, path)
+    print(f"Normalised {path} from {original_size[0]}x{original_size[1]} to {image.size[0]}x{image.size[1]}")
+    return True
+
+
+def normalise_image_files(
+    input_directory,
+    max_resolution=DEFAULT_MAX_RESOLUTION,
+    output_format=DEFAULT_FORMAT,
+    quality=DEFAULT_QUALITY,
+):
+    normalised = []
+    for filename in sorted(os.listdir(input_directory)):
+        path = os.path.join(input_directory, filename)
+        if os.path.isfile(path) and os.path.splitext(filename)[1].lower() in IMAGE_FILE_EXTENSIONS:
+            if normalise_image_file(path, max_resolution, output_format, quality):
+                normalised.append(path)
+    return normalised
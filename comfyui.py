@@ -1,57 +1,136 @@
 import os
-import urllib.request
 import subprocess
 import threading
 import time
+import copy
 import json
-import urllib
 import uuid
 import websocket
 import random
 import requests
 import shutil
 import custom_node_helpers as helpers
+from collections import namedtuple
 from pathlib import Path
-from node import Node
 from weights_downloader import WeightsDownloader
-from urllib.error import URLError
+from result_cache import ResultCache
+from node_cache import NodeCache
+from workflow_analyzer import WorkflowAnalyzer
+from workflow_template import WorkflowTemplate
+from input_downloader import InputDownloader
+from input_cache import InputCache
+from input_validator import validate_input_file
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # --- ADDED: Define global constants for default directories ---
 OUTPUT_DIR = "/tmp/outputs"
 INPUT_DIR = "/tmp/inputs"
+COMFYUI_TEMP_DIR = "ComfyUI/temp"
+# ComfyUI logs this once its HTTP and websocket server is listening
+SERVER_READY_MARKER = "To see the GUI go to"
+SERVER_STARTUP_TIMEOUT = 60
+# REST calls to the local ComfyUI server share one keep-alive session
+HTTP_TIMEOUT = float(os.getenv("COMFYUI_HTTP_TIMEOUT", "30"))
+HTTP_RETRIES = int(os.getenv("COMFYUI_HTTP_RETRIES", "3"))
+# The readiness probe fails fast while the server is still starting
+SERVER_PROBE_TIMEOUT = 1
+
+# Nodes that send their images over the websocket instead of writing files.
+# SaveImageWebsocket ships with ComfyUI, ETN_SendImageWebSocket with
+# comfyui-tooling-nodes.
+WEBSOCKET_OUTPUT_NODES = ["SaveImageWebsocket", "ETN_SendImageWebSocket"]
+# Binary frames start with a 4 byte event type, then a 4 byte image format
+BINARY_IMAGE_EVENTS = {1, 2}
+BINARY_IMAGE_FORMATS = {1: "jpeg", 2: "png"}
+
+WebsocketImage = namedtuple("WebsocketImage", ["prompt_id", "node_id", "format", "data"])
 
 class ComfyUI:
-    def __init__(self, server_address):
+    def __init__(self, server_address, http_timeout=HTTP_TIMEOUT, http_retries=HTTP_RETRIES):
         self.weights_downloader = WeightsDownloader()
         self.server_address = server_address
+        self.http_timeout = http_timeout
+        self.session = self.create_session(http_retries)
+        self.probe_session = self.create_session(0)
         # --- FIX: Set attributes during initialization ---
         self.input_directory = INPUT_DIR
         self.output_directory = OUTPUT_DIR
-
-    def start_server(self, output_directory, input_directory):
+        self.temp_directory = COMFYUI_TEMP_DIR
+        self.server_ready = threading.Event()
+        self.startup_time = None
+        self.result_cache = ResultCache()
+        self.node_cache = NodeCache()
+        self.websocket_images = []
+        # Weights of the job this server is preparing or running
+        self.held_weights = []
+        # Result cache key of the workflow last loaded, for run_workflow
+        self.workflow_cache_key = None
+        self.input_downloader = InputDownloader()
+        self.input_cache = InputCache(self.input_downloader)
+        self.workflow_analyzer = WorkflowAnalyzer(self.weights_downloader, self.apply_node_helper_methods)
+
+    def start_server(self, output_directory, input_directory, temp_directory=None, cpus=None, threads=None):
         # This method now also returns the server process
         self.input_directory = input_directory
         self.output_directory = output_directory
+        if temp_directory:
+            # ComfyUI creates its temp folder inside the given directory
+            self.temp_directory = os.path.join(temp_directory, "temp")
         self.apply_helper_methods("prepare", weights_downloader=self.weights_downloader)
 
         # The server process will be started and managed by this method's caller
-        server_process = self.run_server(output_directory, input_directory)
-
         start_time = time.time()
-        while not self.is_server_running():
-            if server_process.poll() is not None:
-                raise RuntimeError("ComfyUI server process exited unexpectedly.")
-            if time.time() - start_time > 60:
-                raise TimeoutError("Server did not start within 60 seconds")
-            time.sleep(0.5)
+        server_process = self.run_server(output_directory, input_directory, temp_directory, cpus, threads)
+        try:
+            self.wait_for_server(server_process, start_time)
+        except Exception:
+            server_process.terminate()
+            raise
 
-        elapsed_time = time.time() - start_time
-        print(f"Server started in {elapsed_time:.2f} seconds")
+        self.startup_time = time.time() - start_time
+        print(f"Server started in {self.startup_time:.2f} seconds")
         return server_process
 
-    def run_server(self, output_directory, input_directory):
+    def wait_for_server(self, server_process, start_time, timeout=SERVER_STARTUP_TIMEOUT):
+        # The output reader sets server_ready as soon as ComfyUI logs its GUI
+        # URL. HTTP probes back off exponentially and only matter if that line
+        # never shows up, e.g. with a different ComfyUI log format.
+        probe_interval = 0.25
+        next_probe = start_time + probe_interval
+        while not self.server_ready.is_set():
+            if server_process.poll() is not None:
+                raise RuntimeError("ComfyUI server process exited unexpectedly.")
+            now = time.time()
+            if now - start_time > timeout:
+                raise TimeoutError(f"Server did not start within {timeout} seconds")
+            if now >= next_probe:
+                if self.is_server_running():
+                    return
+                probe_interval = min(probe_interval * 2, 4)
+                next_probe = now + probe_interval
+            # Short slices so a crashed server is noticed without waiting for the next probe
+            self.server_ready.wait(max(0, min(next_probe - time.time(), 0.1)))
+
+    def run_server(self, output_directory, input_directory, temp_directory=None, cpus=None, threads=None):
         # This method is now simplified to just start and return the process
-        command = f"python3 ./ComfyUI/main.py --cpu --output-directory {output_directory} --input-directory {input_directory} --disable-metadata"
+        port = self.server_address.rsplit(":", 1)[1]
+        command = f"python3 ./ComfyUI/main.py --cpu --port {port} --output-directory {output_directory} --input-directory {input_directory} --disable-metadata"
+        if temp_directory:
+            command += f" --temp-directory {temp_directory}"
+
+        env = None
+        if threads:
+            # Keep torch and its BLAS backends to the cores this server owns
+            env = dict(
+                os.environ,
+                OMP_NUM_THREADS=str(threads),
+                MKL_NUM_THREADS=str(threads),
+            )
+
+        preexec_fn = None
+        if cpus and hasattr(os, "sched_setaffinity"):
+            preexec_fn = lambda: os.sched_setaffinity(0, cpus)
 
         print(f"[ComfyUI] Starting server with command: {command}")
         server_process = subprocess.Popen(
@@ -60,10 +139,16 @@ class ComfyUI:
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             universal_newlines=True,
+            env=env,
+            preexec_fn=preexec_fn,
         )
 
+        self.server_ready = threading.Event()
+
         def print_output(pipe, prefix):
             for line in iter(pipe.readline, ""):
+                if SERVER_READY_MARKER in line:
+                    self.server_ready.set()
                 print(f"[{prefix}] {line.strip()}", flush=True)
             pipe.close()
 
@@ -74,111 +159,106 @@ class ComfyUI:
         
         return server_process
 
+    def create_session(self, retries):
+        session = requests.Session()
+        # Only idempotent requests are retried; a retried POST /prompt could
+        # queue the same workflow twice
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.1,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=["GET"],
+        )
+        session.mount("http://", HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=4))
+        return session
+
     def is_server_running(self):
         try:
-            with urllib.request.urlopen(
-                "http://{}/history/{}".format(self.server_address, "123")
-            ) as response:
-                return response.status == 200
-        except URLError:
+            response = self.probe_session.get(
+                f"http://{self.server_address}/history/123", timeout=SERVER_PROBE_TIMEOUT
+            )
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
             return False
 
     def apply_helper_methods(self, method_name, *args, **kwargs):
-        for module_name in dir(helpers):
-            module = getattr(helpers, module_name)
-            method = getattr(module, method_name, None)
+        for helper in helpers.helper_classes:
+            method = getattr(helper, method_name, None)
             if callable(method):
                 method(*args, **kwargs)
 
-    def handle_weights(self, workflow, weights_to_download=None):
+    def apply_node_helper_methods(self, method_name, *args):
+        # The node is the last argument of every per-node hook
+        node = args[-1]
+        for method in helpers.node_hooks(method_name, node.node.get("class_type")):
+            method(*args)
+
+    def handle_weights(self, workflow, weights_to_download=None, plan=None):
         if weights_to_download is None:
             weights_to_download = []
+        if plan is None:
+            plan = self.workflow_analyzer.analyze(workflow)
+            plan.apply(workflow)
 
         print("Checking weights")
-        embeddings = self.weights_downloader.get_weights_by_type("EMBEDDINGS")
-        embedding_to_fullname = {emb.split(".")[0]: emb for emb in embeddings}
-        weights_filetypes = self.weights_downloader.supported_filetypes
-
-        self.convert_lora_loader_nodes(workflow)
-
-        for node in workflow.values():
-            if not isinstance(node, dict): continue
-            if node.get("class_type") in ["HFHubLoraLoader", "LoraLoaderFromURL"]:
-                continue
-            self.apply_helper_methods("add_weights", weights_to_download, Node(node))
-            if "inputs" in node:
-                for input_key, input_value in node["inputs"].items():
-                    if isinstance(input_value, str):
-                        if any(key in input_value for key in embedding_to_fullname):
-                            weights_to_download.extend(
-                                embedding_to_fullname[key]
-                                for key in embedding_to_fullname
-                                if key in input_value
-                            )
-                        elif any(input_value.endswith(ft) for ft in weights_filetypes):
-                            weight_str = self.weights_downloader.get_canonical_weight_str(input_value)
-                            if weight_str != input_value:
-                                print(f"Converting model synonym {input_value} to {weight_str}")
-                                node["inputs"][input_key] = weight_str
-                            weights_to_download.append(weight_str)
-
-        weights_to_download = list(set(weights_to_download))
-        for weight in weights_to_download:
-            self.weights_downloader.download_weights(weight)
+        weight_strs = list(dict.fromkeys(plan.weights + weights_to_download))
+        # Held before they are checked, so no other server evicts them
+        # between now and the end of the job
+        self.release_weights()
+        self.held_weights = weight_strs
+        self.weights_downloader.model_cache.hold(weight_strs)
+        self.weights_downloader.download_all(weight_strs)
         print("====================================")
 
-    def is_image_or_video_value(self, value):
-        filetypes = [".png", ".jpg", ".jpeg", ".webp", ".mp4", ".webm"]
-        return isinstance(value, str) and any(
-            value.lower().endswith(ft) for ft in filetypes
-        )
+    def release_weights(self):
+        self.weights_downloader.model_cache.release(self.held_weights)
+        self.held_weights = []
 
-    def handle_known_unsupported_nodes(self, workflow):
-        for node in workflow.values():
-            if isinstance(node, dict):
-                self.apply_helper_methods("check_for_unsupported_nodes", Node(node))
+    def handle_known_unsupported_nodes(self, workflow, plan=None):
+        if plan is None:
+            plan = self.workflow_analyzer.analyze(workflow)
+        if plan.errors:
+            raise ValueError(plan.errors[0])
+
+    def handle_inputs(self, workflow, plan=None):
+        if plan is None:
+            plan = self.workflow_analyzer.analyze(workflow)
+            plan.apply(workflow)
 
-    def handle_inputs(self, workflow):
         print("Checking inputs")
-        seen_inputs = set()
         missing_inputs = []
-        for node in workflow.values():
-            if not isinstance(node, dict): continue
-            if node.get("class_type") in ["LoraLoaderFromURL", "LoraLoader"]:
-                continue
-            if "inputs" in node:
-                for input_key, input_value in node["inputs"].items():
-                    if isinstance(input_value, str) and input_value not in seen_inputs:
-                        seen_inputs.add(input_value)
-                        if input_value.startswith(("http://", "https://")):
-                            filename = os.path.join(
-                                self.input_directory, os.path.basename(input_value)
-                            )
-                            if not os.path.exists(filename):
-                                print(f"Downloading {input_value} to {filename}")
-                                try:
-                                    response = requests.get(input_value)
-                                    response.raise_for_status()
-                                    with open(filename, "wb") as file:
-                                        file.write(response.content)
-                                    print(f"✅ {filename}")
-                                except requests.exceptions.RequestException as e:
-                                    print(f"❌ Error downloading {input_value}: {e}")
-                                    missing_inputs.append(filename)
-                            node["inputs"][input_key] = os.path.basename(filename)
-                        elif self.is_image_or_video_value(input_value):
-                            filename = os.path.join(
-                                self.input_directory, os.path.basename(input_value)
-                            )
-                            if not os.path.exists(filename):
-                                print(f"❌ {filename} not provided")
-                                missing_inputs.append(filename)
-                            else:
-                                print(f"✅ {filename}")
+        downloads = {
+            url: os.path.join(self.input_directory, basename)
+            for url, basename in plan.urls.items()
+            if not os.path.exists(os.path.join(self.input_directory, basename))
+        }
+        errors = self.input_downloader.download_all(downloads, fetch=self.input_cache.fetch)
+        missing_inputs.extend(downloads[url] for url in errors)
+
+        for basename in plan.input_files:
+            filename = os.path.join(self.input_directory, basename)
+            if not os.path.exists(filename):
+                print(f"❌ {filename} not provided")
+                missing_inputs.append(filename)
+            else:
+                print(f"✅ {filename}")
 
         if missing_inputs:
             raise Exception(f"Missing required input files: {', '.join(missing_inputs)}")
 
+        # Reject corrupt or oversized inputs from their headers, before the
+        # server spends any time decoding them
+        invalid_inputs = []
+        for basename in sorted(set(plan.input_files) | set(plan.urls.values())):
+            filename = os.path.join(self.input_directory, basename)
+            reason = validate_input_file(filename)
+            if reason:
+                print(f"❌ {filename}: {reason}")
+                invalid_inputs.append(f"{basename} ({reason})")
+
+        if invalid_inputs:
+            raise ValueError(f"Invalid input files: {', '.join(invalid_inputs)}")
+
     def connect(self):
         self.client_id = str(uuid.uuid4())
         self.ws = websocket.WebSocket()
@@ -186,27 +266,24 @@ class ComfyUI:
 
     def post_request(self, endpoint, data=None):
         url = f"http://{self.server_address}{endpoint}"
-        headers = {"Content-Type": "application/json"} if data else {}
-        json_data = json.dumps(data).encode("utf-8") if data else None
-        req = urllib.request.Request(url, data=json_data, headers=headers, method="POST")
-        with urllib.request.urlopen(req) as response:
-            if response.status != 200:
-                print(f"Failed: {endpoint}, status code: {response.status}")
+        response = self.session.post(url, json=data, timeout=self.http_timeout)
+        if response.status_code != 200:
+            print(f"Failed: {endpoint}, status code: {response.status_code}")
+        response.raise_for_status()
 
     def clear_queue(self):
         self.post_request("/queue", {"clear": True})
         self.post_request("/interrupt")
 
     def queue_prompt(self, prompt):
-        try:
-            p = {"prompt": prompt, "client_id": self.client_id}
-            data = json.dumps(p).encode("utf-8")
-            req = urllib.request.Request(f"http://{self.server_address}/prompt", data=data)
-            output = json.loads(urllib.request.urlopen(req).read())
-            return output["prompt_id"]
-        except urllib.error.HTTPError as e:
-            print(f"ComfyUI error: {e.code} {e.reason} {e.read().decode('utf-8')}")
+        p = {"prompt": prompt, "client_id": self.client_id}
+        response = self.session.post(
+            f"http://{self.server_address}/prompt", json=p, timeout=self.http_timeout
+        )
+        if response.status_code != 200:
+            print(f"ComfyUI error: {response.status_code} {response.reason} {response.text}")
             raise Exception("ComfyUI Error – Your workflow could not be run.")
+        return response.json()["prompt_id"]
 
     def _delete_corrupted_weights(self, error_data):
         if "current_inputs" in error_data:
@@ -220,55 +297,149 @@ class ComfyUI:
                 self.weights_downloader.delete_weights(weight_file)
             raise Exception("Corrupted weights deleted. Please try again.")
 
+    def raise_execution_error(self, message):
+        error_data = message["data"]
+        if "exception_type" in error_data and error_data["exception_type"] == "safetensors_rust.SafetensorError":
+            self._delete_corrupted_weights(error_data)
+        if "exception_message" in error_data and "Unauthorized" in error_data["exception_message"]:
+            raise Exception("ComfyUI API nodes are not currently supported.")
+        error_message = json.dumps(message, indent=2)
+        raise Exception(f"Workflow execution error:\n\n{error_message}")
+
     def wait_for_prompt_completion(self, workflow, prompt_id):
+        images = []
+        current_node = None
         while True:
             out = self.ws.recv()
             if isinstance(out, str):
                 message = json.loads(out)
                 if message["type"] == "execution_error":
-                    error_data = message["data"]
-                    if "exception_type" in error_data and error_data["exception_type"] == "safetensors_rust.SafetensorError":
-                        self._delete_corrupted_weights(error_data)
-                    if "exception_message" in error_data and "Unauthorized" in error_data["exception_message"]:
-                        raise Exception("ComfyUI API nodes are not currently supported.")
-                    error_message = json.dumps(message, indent=2)
-                    raise Exception(f"Workflow execution error:\n\n{error_message}")
+                    self.raise_execution_error(message)
                 if message["type"] == "executing":
                     data = message["data"]
                     if data["node"] is None and data["prompt_id"] == prompt_id:
                         break
                     elif data["prompt_id"] == prompt_id:
+                        current_node = data["node"]
                         node = workflow.get(data["node"], {})
                         meta = node.get("_meta", {})
                         class_type = node.get("class_type", "Unknown")
                         print(f"Executing node {data['node']}, title: {meta.get('title', 'Unknown')}, class type: {class_type}")
-            else:
-                continue
+            elif current_node is not None and len(out) > 8:
+                # Previews from samplers use the same frames, so only keep
+                # images sent by websocket output nodes
+                event_type = int.from_bytes(out[:4], "big")
+                class_type = workflow.get(current_node, {}).get("class_type")
+                if event_type in BINARY_IMAGE_EVENTS and class_type in WEBSOCKET_OUTPUT_NODES:
+                    image_format = BINARY_IMAGE_FORMATS.get(int.from_bytes(out[4:8], "big"), "png")
+                    images.append(WebsocketImage(prompt_id, current_node, image_format, out[8:]))
+        return images
+
+    def has_websocket_outputs(self, workflow):
+        return any(
+            isinstance(node, dict) and node.get("class_type") in WEBSOCKET_OUTPUT_NODES
+            for node in workflow.values()
+        )
 
-    def load_workflow(self, workflow):
+    def convert_save_image_nodes(self, workflow):
+        # Deliver final images in memory instead of writing them to the output
+        # directory and reading them back
+        for node in workflow.values():
+            if isinstance(node, dict) and node.get("class_type") == "SaveImage":
+                print("Converting SaveImage node to SaveImageWebsocket")
+                node["class_type"] = "SaveImageWebsocket"
+                node["inputs"] = {"images": node["inputs"]["images"]}
+        return workflow
+
+    def parse_workflow(self, workflow):
         if not isinstance(workflow, dict):
             wf = json.loads(workflow)
         else:
             wf = workflow
         if any(key in wf.keys() for key in ["last_node_id", "last_link_id", "version"]):
             raise ValueError("You must use the API JSON version of a ComfyUI workflow.")
-        self.handle_known_unsupported_nodes(wf)
-        self.handle_inputs(wf)
-        self.handle_weights(wf)
         return wf
 
-    def run_workflow(self, workflow):
+    def load_workflow(self, workflow, bypass_cache=False):
+        wf = self.parse_workflow(workflow)
+        # One analysis pass, reused as long as the workflow JSON is unchanged
+        plan = self.workflow_analyzer.analyze(wf)
+        self.handle_known_unsupported_nodes(wf, plan)
+        plan.apply(wf)
+        self.handle_inputs(wf, plan)
+        self.handle_weights(wf, plan=plan)
+        self.workflow_cache_key = self.result_cache_key(wf, bypass_cache)
+        if not bypass_cache:
+            self.node_cache.apply(wf, self.input_directory)
+        return wf
+
+    def compile_workflow(self, workflow, slots=None, weights_to_download=None, pin_weights=False):
+        # Analyze once and download the weights; jobs then only fill in slots.
+        # Pinned weights are never evicted from the model cache.
+        wf = copy.deepcopy(self.parse_workflow(workflow))
+        plan = self.workflow_analyzer.analyze(wf)
+        self.handle_known_unsupported_nodes(wf, plan)
+        plan.apply(wf)
+        if pin_weights:
+            self.weights_downloader.model_cache.pin(plan.weights + (weights_to_download or []))
+        self.handle_weights(wf, weights_to_download, plan=plan)
+        return WorkflowTemplate(wf, plan, self.workflow_analyzer, slots)
+
+    def load_template(self, template, values=None, bypass_cache=False):
+        wf, plan = template.instantiate(values)
+        self.handle_inputs(wf, plan)
+        self.handle_weights(wf, plan=plan)
+        self.workflow_cache_key = self.result_cache_key(wf, bypass_cache)
+        if not bypass_cache:
+            self.node_cache.apply(wf, self.input_directory)
+        return wf
+
+    def result_cache_key(self, workflow, bypass_cache=False):
+        # Websocket images never touch the disk, so there is nothing to cache
+        if not self.result_cache.enabled or bypass_cache or self.has_websocket_outputs(workflow):
+            return None
+        return self.result_cache.key(workflow, self.input_directory)
+
+    def run_workflow(self, workflow, bypass_cache=False, cache_key=None):
+        # cache_key is workflow_cache_key from load_workflow or load_template,
+        # taken before the node cache replaced captured nodes with their
+        # outputs, so a job has the same key whether or not they were captured
+        try:
+            return self._run_workflow(workflow, bypass_cache, cache_key)
+        finally:
+            # The workflow has loaded its weights by now
+            self.release_weights()
+
+    def _run_workflow(self, workflow, bypass_cache=False, cache_key=None):
         print("Running workflow")
+        self.websocket_images = []
+        if cache_key is None:
+            cache_key = self.result_cache_key(workflow, bypass_cache)
+        if cache_key:
+            output_json = self.result_cache.restore(cache_key, self.output_directory, self.temp_directory)
+            if output_json is not None:
+                print(f"✅ Using cached result {cache_key[:12]}")
+                print("outputs: ", output_json)
+                print("====================================")
+                return output_json
+
         prompt_id = self.queue_prompt(workflow)
-        self.wait_for_prompt_completion(workflow, prompt_id)
-        output_json = self.get_history(prompt_id)
+        self.websocket_images = self.wait_for_prompt_completion(workflow, prompt_id)
+        output_json = self.node_cache.collect(self.get_history(prompt_id), self.output_directory)
+        if cache_key:
+            self.result_cache.store(cache_key, output_json, self.output_directory, self.temp_directory)
         print("outputs: ", output_json)
+        if self.websocket_images:
+            print(f"websocket images: {len(self.websocket_images)}")
         print("====================================")
+        return output_json
 
     def get_history(self, prompt_id):
-        with urllib.request.urlopen(f"http://{self.server_address}/history/{prompt_id}") as response:
-            output = json.loads(response.read())
-            return output[prompt_id]["outputs"]
+        response = self.session.get(
+            f"http://{self.server_address}/history/{prompt_id}", timeout=self.http_timeout
+        )
+        response.raise_for_status()
+        return response.json()[prompt_id]["outputs"]
 
     def get_files(self, directories, prefix="", file_extensions=None):
         files = []
@@ -296,14 +467,3 @@ class ComfyUI:
             if os.path.exists(directory):
                 shutil.rmtree(directory)
             os.makedirs(directory)
-
-    def convert_lora_loader_nodes(self, workflow):
-        for node in workflow.values():
-            if isinstance(node, dict) and node.get("class_type") == "LoraLoader":
-                inputs = node.get("inputs", {})
-                if "lora_name" in inputs and isinstance(inputs["lora_name"], str):
-                    if inputs["lora_name"].startswith(("http://", "https://")):
-                        print("Converting LoraLoader node to LoraLoaderFromURL")
-                        node["class_type"] = "LoraLoaderFromURL"
-                        node["inputs"]["url"] = inputs["lora_name"]
-                        del node["inputs"]["lora_name"]
\ No newline at end of file
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import uuid
+import aiohttp
+from comfyui import ComfyUI
+
+
+class AsyncComfyUI:
+    # asyncio counterpart of ComfyUI for keeping many prompts in flight. One
+    # websocket per server carries the events for every prompt this client
+    # queued, and each prompt_id resolves its own future.
+    def __init__(self, server_address, comfyUI=None, request_timeout=30):
+        self.server_address = server_address
+        # Workflow analysis and weight downloads are shared with the sync client
+        self.comfyUI = comfyUI or ComfyUI(server_address)
+        self.request_timeout = request_timeout
+        self.client_id = str(uuid.uuid4())
+        self.session = None
+        self.ws = None
+        self.listener = None
+        self.prompts = {}
+        # Events that arrive before queue_prompt has registered the prompt_id.
+        # Only kept while a queue request is in flight, so events for prompts
+        # that wait() has already finished with are dropped.
+        self.early_results = {}
+        self.queue_requests = 0
+        # Set once the websocket listener exits; later prompts fail with it
+        self.listener_error = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def connect(self):
+        self.session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+        )
+        self.ws = await self.session.ws_connect(
+            f"ws://{self.server_address}/ws?clientId={self.client_id}",
+            heartbeat=30,
+            max_msg_size=0,
+        )
+        self.listener = asyncio.create_task(self.listen())
+
+    async def close(self):
+        if self.listener:
+            self.listener.cancel()
+            try:
+                await self.listener
+            except asyncio.CancelledError:
+                pass
+            self.listener = None
+        if self.ws:
+            await self.ws.close()
+            self.ws = None
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    def resolve(self, prompt_id, error=None):
+        future = self.prompts.get(prompt_id)
+        if future is None:
+            # ComfyUI follows an execution_error with executing node=None,
+            # which must not turn the failure into a success
+            if self.queue_requests and (error is not None or prompt_id not in self.early_results):
+                self.early_results[prompt_id] = error
+        elif not future.done():
+            if error is None:
+                future.set_result(prompt_id)
+            else:
+                future.set_exception(error)
+
+    def handle_message(self, message):
+        data = message.get("data", {})
+        prompt_id = data.get("prompt_id")
+        if prompt_id is None:
+            return
+
+        if message["type"] == "execution_error":
+            try:
+                self.comfyUI.raise_execution_error(message)
+            except Exception as e:
+                self.resolve(prompt_id, e)
+        elif message["type"] == "execution_interrupted":
+            self.resolve(prompt_id, Exception(f"Prompt {prompt_id} was interrupted"))
+        elif message["type"] == "executing" and data.get("node") is None:
+            self.resolve(prompt_id)
+
+    async def listen(self):
+        try:
+            async for msg in self.ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    self.handle_message(json.loads(msg.data))
+                elif msg.type == aiohttp.WSMsgType.ERROR:
+                    break
+        finally:
+            error = ConnectionError(f"Websocket to {self.server_address} closed")
+            self.listener_error = error
+            for future in self.prompts.values():
+                if not future.done():
+                    future.set_exception(error)
+
+    async def post_request(self, endpoint, data=None):
+        async with self.session.post(
+            f"http://{self.server_address}{endpoint}", json=data
+        ) as response:
+            if response.status != 200:
+                print(f"Failed: {endpoint}, status code: {response.status}")
+
+    async def clear_queue(self):
+        await self.post_request("/queue", {"clear": True})
+        await self.post_request("/interrupt")
+
+    async def queue_prompt(self, prompt):
+        payload = {"prompt": prompt, "client_id": self.client_id}
+        self.queue_requests += 1
+        try:
+            async with self.session.post(
+                f"http://{self.server_address}/prompt", json=payload
+            ) as response:
+                if response.status != 200:
+                    print(f"ComfyUI error: {response.status} {response.reason} {await response.text()}")
+                    raise Exception("ComfyUI Error – Your workflow could not be run.")
+                output = await response.json()
+
+            prompt_id = output["prompt_id"]
+            future = asyncio.get_running_loop().create_future()
+            self.prompts[prompt_id] = future
+            if prompt_id in self.early_results:
+                self.resolve(prompt_id, self.early_results.pop(prompt_id))
+            elif self.listener_error is not None:
+                future.set_exception(self.listener_error)
+        finally:
+            self.queue_requests -= 1
+            if not self.queue_requests:
+                self.early_results.clear()
+        return prompt_id
+
+    async def wait(self, prompt_id, timeout=None):
+        try:
+            await asyncio.wait_for(asyncio.shield(self.prompts[prompt_id]), timeout)
+        finally:
+            if self.prompts[prompt_id].done():
+                del self.prompts[prompt_id]
+        return await self.get_history(prompt_id)
+
+    async def get_history(self, prompt_id):
+        async with self.session.get(
+            f"http://{self.server_address}/history/{prompt_id}"
+        ) as response:
+            output = await response.json()
+            return output[prompt_id]["outputs"]
+
+    async def load_workflow(self, workflow):
+        # Input and weight handling is blocking file and network I/O
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.comfyUI.load_workflow, workflow)
+
+    async def run_workflow(self, workflow, timeout=None):
+        prompt_id = await self.queue_prompt(workflow)
+        return await self.wait(prompt_id, timeout)
@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from comfyui import ComfyUI, OUTPUT_DIR, INPUT_DIR
+
+POOL_TEMP_DIR = "/tmp/comfyui_pool"
+DEFAULT_BASE_PORT = 8188
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def split_cpus(cpus, size):
+    # Contiguous, near-equal slices so each server keeps its cores (and their
+    # caches) to itself
+    chunk, remainder = divmod(len(cpus), size)
+    slices = []
+    start = 0
+    for index in range(size):
+        end = start + chunk + (1 if index < remainder else 0)
+        slices.append(set(cpus[start:end]) or set(cpus))
+        start = end
+    return slices
+
+
+class PooledServer:
+    def __init__(self, index, comfyUI, cpus):
+        self.index = index
+        self.comfyUI = comfyUI
+        self.cpus = cpus
+        self.process = None
+        self.in_flight = 0
+        self.completed = 0
+        self.busy_seconds = 0.0
+        self.busy_since = None
+
+    def stats(self, elapsed):
+        busy_seconds = self.busy_seconds
+        if self.busy_since is not None:
+            busy_seconds += time.time() - self.busy_since
+        return {
+            "server": self.comfyUI.server_address,
+            "cpus": sorted(self.cpus),
+            "startup_seconds": round(self.comfyUI.startup_time or 0.0, 2),
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "busy_seconds": round(busy_seconds, 2),
+            "utilization": round(busy_seconds / elapsed, 3) if elapsed else 0.0,
+            "result_cache": self.comfyUI.result_cache.stats(),
+            "node_cache": self.comfyUI.node_cache.stats(),
+            "input_cache": self.comfyUI.input_cache.stats(),
+            "model_cache": self.comfyUI.weights_downloader.model_cache.stats(),
+        }
+
+
+class ComfyUIPool:
+    # Runs several ComfyUI servers side by side, each on its own port, CPU set
+    # and input/output directories, and hands work to the least-loaded one.
+    def __init__(
+        self,
+        size,
+        output_directory=OUTPUT_DIR,
+        input_directory=INPUT_DIR,
+        base_port=DEFAULT_BASE_PORT,
+        prompts_per_server=1,
+        pin_cpus=True,
+    ):
+        if size < 1:
+            raise ValueError("A ComfyUI pool needs at least one server")
+
+        self.size = size
+        self.output_directory = output_directory
+        self.input_directory = input_directory
+        self.prompts_per_server = prompts_per_server
+        self.pin_cpus = pin_cpus and size > 1
+        self.condition = threading.Condition()
+        self.started_at = None
+
+        cpu_slices = split_cpus(available_cpus(), size)
+        self.servers = [
+            PooledServer(index, ComfyUI(f"127.0.0.1:{base_port + index}"), cpu_slices[index])
+            for index in range(size)
+        ]
+
+    def directories(self, index):
+        # A single server keeps the default directories, so one-server pools
+        # behave exactly like a plain ComfyUI
+        if self.size == 1:
+            return self.output_directory, self.input_directory, None
+        return (
+            os.path.join(self.output_directory, str(index)),
+            os.path.join(self.input_directory, str(index)),
+            os.path.join(POOL_TEMP_DIR, str(index)),
+        )
+
+    def start(self):
+        errors = []
+
+        def start_server(server):
+            output_directory, input_directory, temp_directory = self.directories(server.index)
+            for directory in [output_directory, input_directory]:
+                os.makedirs(directory, exist_ok=True)
+            cpus = server.cpus if self.pin_cpus else None
+            threads = len(server.cpus) if self.pin_cpus else None
+            try:
+                server.process = server.comfyUI.start_server(
+                    output_directory, input_directory, temp_directory, cpus, threads
+                )
+                server.comfyUI.connect()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [
+            threading.Thread(target=start_server, args=(server,))
+            for server in self.servers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            self.shutdown()
+            raise errors[0]
+
+        self.started_at = time.time()
+        print(f"ComfyUI pool started with {self.size} server(s)")
+
+    def least_loaded(self):
+        candidates = [
+            server
+            for server in self.servers
+            if server.in_flight < self.prompts_per_server
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda server: (server.in_flight, server.busy_seconds))
+
+    @contextmanager
+    def acquire(self):
+        with self.condition:
+            server = self.least_loaded()
+            while server is None:
+                self.condition.wait()
+                server = self.least_loaded()
+            server.in_flight += 1
+            if server.busy_since is None:
+                server.busy_since = time.time()
+
+        try:
+            yield server.comfyUI
+        finally:
+            with self.condition:
+                server.in_flight -= 1
+                server.completed += 1
+                if server.in_flight == 0:
+                    server.busy_seconds += time.time() - server.busy_since
+                    server.busy_since = None
+                self.condition.notify()
+
+    def utilization(self):
+        elapsed = time.time() - self.started_at if self.started_at else 0.0
+        with self.condition:
+            return [server.stats(elapsed) for server in self.servers]
+
+    def print_utilization(self):
+        for stats in self.utilization():
+            print(
+                f"[{stats['server']}] {stats['completed']} completed, busy {stats['busy_seconds']}s, utilization {stats['utilization'] * 100:.1f}%"
+            )
+
+    def shutdown(self):
+        for server in self.servers:
+            if server.process and server.process.poll() is None:
+                print(f"Shutting down ComfyUI server {server.comfyUI.server_address}...")
+                server.process.terminate()
+        for server in self.servers:
+            if server.process:
+                server.process.wait()
+                server.process = None
@@ -6,6 +6,12 @@ class CustomNodeHelper:
         # Placeholder method to prepare a custom node before ComfyUI starts
         pass
 
+    @staticmethod
+    def class_types():
+        # Node class_types that add_weights and check_for_unsupported_nodes act on.
+        # None means the hooks are called for every node in a workflow.
+        return None
+
     @staticmethod
     def weights_map(base_url):
         # Placeholder method for mapping weights based on a base URL.
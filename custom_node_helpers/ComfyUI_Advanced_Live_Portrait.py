@@ -9,9 +9,15 @@ MODELS = [
     "warping_module.safetensors",
 ]
 
+NODE_TYPES = ("ExpressionEditor", "AdvancedLivePortrait")
+
 
 class ComfyUI_Advanced_Live_Portrait(CustomNodeHelper):
+    @staticmethod
+    def class_types():
+        return list(NODE_TYPES)
+
     @staticmethod
     def add_weights(weights_to_download, node):
-        if node.is_type_in(["ExpressionEditor", "AdvancedLivePortrait"]):
+        if node.is_type_in(NODE_TYPES):
             weights_to_download.extend(MODELS)
@@ -2,15 +2,21 @@ from custom_node_helper import CustomNodeHelper
 
 MODELS = ["MTEED.pth"]
 
+NODE_TYPES = ("AnyLinePreprocessor",)
+
 
 class ComfyUI_Anyline(CustomNodeHelper):
     @staticmethod
     def models():
         return MODELS
 
+    @staticmethod
+    def class_types():
+        return list(NODE_TYPES)
+
     @staticmethod
     def add_weights(weights_to_download, node):
-        if node.is_type("AnyLinePreprocessor"):
+        if node.is_type_in(NODE_TYPES):
             weights_to_download.extend(MODELS)
 
     @staticmethod
@@ -4,14 +4,20 @@ MODELS = [
     "RMBG-1.4/model.pth",
 ]
 
+NODE_TYPES = ("BRIA_RMBG_ModelLoader_Zho",)
+
 class ComfyUI_BRIA_AI_RMBG(CustomNodeHelper):
     @staticmethod
     def models():
         return MODELS
 
+    @staticmethod
+    def class_types():
+        return list(NODE_TYPES)
+
     @staticmethod
     def add_weights(weights_to_download, node):
-        if node.is_type("BRIA_RMBG_ModelLoader_Zho"):
+        if node.is_type_in(NODE_TYPES):
             weights_to_download.extend(MODELS)
 
     @staticmethod
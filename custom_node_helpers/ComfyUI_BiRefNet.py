@@ -9,16 +9,24 @@ MODELS = [
     "swin_large_patch4_window12_384_22kto1k.pth",
 ]
 
+MODEL_LOADER = "BiRefNet_ModelLoader_Zho"
+AUTO_DOWNLOAD_LOADER = "AutoDownloadBiRefNetModel"
+NODE_TYPES = (MODEL_LOADER, AUTO_DOWNLOAD_LOADER)
+
 
 class ComfyUI_BiRefNet(CustomNodeHelper):
     @staticmethod
     def models():
         return MODELS
 
+    @staticmethod
+    def class_types():
+        return list(NODE_TYPES)
+
     @staticmethod
     def add_weights(weights_to_download, node):
-        if node.is_type("BiRefNet_ModelLoader_Zho"):
+        if node.is_type(MODEL_LOADER):
             weights_to_download.extend(MODELS)
-        elif node.is_type("AutoDownloadBiRefNetModel"):
+        elif node.is_type(AUTO_DOWNLOAD_LOADER):
             model_name = node.input("model_name")
             weights_to_download.append(f"{model_name}.safetensors")
@@ -1,9 +1,15 @@
 from custom_node_helper import CustomNodeHelper
 
+UNSUPPORTED_NODES = {
+    "Terminal": "Node is not supported",
+}
+
+
 class ComfyUI_BrushNet(CustomNodeHelper):
+    @staticmethod
+    def class_types():
+        return list(UNSUPPORTED_NODES)
+
     @staticmethod
     def check_for_unsupported_nodes(node):
-        unsupported_nodes = {
-            "Terminal": "Node is not supported",
-        }
-        node.raise_if_unsupported(unsupported_nodes)
+        node.raise_if_unsupported(UNSUPPORTED_NODES)
@@ -173,6 +173,10 @@ class ComfyUI_Controlnet_Aux(CustomNodeHelper):
             ],
         }
 
+    @staticmethod
+    def class_types():
+        return list(ComfyUI_Controlnet_Aux.node_class_mapping()) + ["AIO_Preprocessor"]
+
     @staticmethod
     def add_weights(weights_to_download, node):
         node_mapping = ComfyUI_Controlnet_Aux.node_class_mapping()
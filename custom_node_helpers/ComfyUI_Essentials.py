@@ -1,8 +1,14 @@
 from custom_node_helper import CustomNodeHelper
 
+NODE_TYPES = ("LoadCLIPSegModels",)
+
 
 class ComfyUI_Essentials(CustomNodeHelper):
+    @staticmethod
+    def class_types():
+        return list(NODE_TYPES)
+
     @staticmethod
     def add_weights(weights_to_download, node):
-        if node.is_type("LoadCLIPSegModels"):
+        if node.is_type_in(NODE_TYPES):
             weights_to_download.extend(["models--CIDAS--clipseg-rd64-refined"])
@@ -1,7 +1,13 @@
 from custom_node_helper import CustomNodeHelper
 
+NODE_TYPES = ("JPEG artifacts removal FBCNN",)
+
 class ComfyUI_FBCNN(CustomNodeHelper):
+    @staticmethod
+    def class_types():
+        return list(NODE_TYPES)
+
     @staticmethod
     def add_weights(weights_to_download, node):
-        if node.is_type("JPEG artifacts removal FBCNN"):
+        if node.is_type_in(NODE_TYPES):
             weights_to_download.append("fbcnn_color.pth")
@@ -33,6 +33,16 @@ FRAME_INTERPOLATION_MODELS_PATH = (
     "ComfyUI/custom_nodes/ComfyUI-Frame-Interpolation/ckpts"
 )
 
+UNSUPPORTED_NODES = {
+    "IFRNet VFI": "Use RIFE or FILM - IFRNet weights are not available",
+    "IFUnet VFI": "Use RIFE or FILM - IFUnet weights are not available",
+    "MCM VFI": "Use RIFE or FILM - MCM is not available because cupy is not installed",
+    "GMFSS Fortuna VFI": "Use RIFE or FILM - GMFSS Fortuna VFI is not available because cupy is not installed",
+    "Sepconv VFI": "Use RIFE or FILM - Sepconv VFI is not available because cupy is not installed",
+    "STMFNet VFI": "Use RIFE or FILM - STMFNet VFI is not available because cupy is not installed",
+    "FLAVR VFI": "Use RIFE or FILM - FLAVR VFI weights are not available",
+}
+
 
 class ComfyUI_Frame_Interpolation(CustomNodeHelper):
     @staticmethod
@@ -56,15 +66,10 @@ class ComfyUI_Frame_Interpolation(CustomNodeHelper):
                 }
         return weights
 
+    @staticmethod
+    def class_types():
+        return list(UNSUPPORTED_NODES)
+
     @staticmethod
     def check_for_unsupported_nodes(node):
-        unsupported_nodes = {
-            "IFRNet VFI": "Use RIFE or FILM - IFRNet weights are not available",
-            "IFUnet VFI": "Use RIFE or FILM - IFUnet weights are not available",
-            "MCM VFI": "Use RIFE or FILM - MCM is not available because cupy is not installed",
-            "GMFSS Fortuna VFI": "Use RIFE or FILM - GMFSS Fortuna VFI is not available because cupy is not installed",
-            "Sepconv VFI": "Use RIFE or FILM - Sepconv VFI is not available because cupy is not installed",
-            "STMFNet VFI": "Use RIFE or FILM - STMFNet VFI is not available because cupy is not installed",
-            "FLAVR VFI": "Use RIFE or FILM - FLAVR VFI weights are not available",
-        }
-        node.raise_if_unsupported(unsupported_nodes)
+        node.raise_if_unsupported(UNSUPPORTED_NODES)
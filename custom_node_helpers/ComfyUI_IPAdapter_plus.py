@@ -22,6 +22,14 @@ PRESETS = [
     "Kolors",
 ]
 
+UNIFIED_LOADERS = (
+    "IPAdapterUnifiedLoader",
+    "IPAdapterUnifiedLoaderFaceID",
+    "IPAdapterUnifiedLoaderCommunity",
+)
+INSIGHTFACE_LOADER = "IPAdapterInsightFaceLoader"
+NODE_TYPES = UNIFIED_LOADERS + (INSIGHTFACE_LOADER,)
+
 
 class ComfyUI_IPAdapter_plus(CustomNodeHelper):
     @staticmethod
@@ -142,20 +150,18 @@ class ComfyUI_IPAdapter_plus(CustomNodeHelper):
 
         return weights_to_add
 
+    @staticmethod
+    def class_types():
+        return list(NODE_TYPES)
+
     @staticmethod
     def add_weights(weights_to_download, node):
-        if node.is_type_in(
-            [
-                "IPAdapterUnifiedLoader",
-                "IPAdapterUnifiedLoaderFaceID",
-                "IPAdapterUnifiedLoaderCommunity",
-            ]
-        ):
+        if node.is_type_in(UNIFIED_LOADERS):
             preset = node.input("preset")
             print(f"Including weights for IPAdapter preset: {preset}")
             if preset:
                 weights_to_download.extend(
                     ComfyUI_IPAdapter_plus.get_preset_weights(preset)
                 )
-        elif node.is_type("IPAdapterInsightFaceLoader"):
+        elif node.is_type(INSIGHTFACE_LOADER):
             weights_to_download.append("models/buffalo_l")
@@ -1,9 +1,15 @@
 from custom_node_helper import CustomNodeHelper
 
+NODE_TYPES = ("UltralyticsDetectorProvider",)
+
 class ComfyUI_Impact_Pack(CustomNodeHelper):
+    @staticmethod
+    def class_types():
+        return list(NODE_TYPES)
+
     @staticmethod
     def add_weights(weights_to_download, node):
-        if node.is_type("UltralyticsDetectorProvider"):
+        if node.is_type_in(NODE_TYPES):
             weights_to_download.extend([
                 "bbox/hand_yolov8s.pt",
                 "bbox/face_yolov8m.pt",
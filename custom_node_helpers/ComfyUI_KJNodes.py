@@ -1,7 +1,13 @@
 from custom_node_helper import CustomNodeHelper
 
+NODE_TYPES = ("BatchCLIPSeg", "DownloadAndLoadCLIPSeg")
+
 class ComfyUI_KJNodes(CustomNodeHelper):
+    @staticmethod
+    def class_types():
+        return list(NODE_TYPES)
+
     @staticmethod
     def add_weights(weights_to_download, node):
-        if node.is_type_in(["BatchCLIPSeg", "DownloadAndLoadCLIPSeg"]):
+        if node.is_type_in(NODE_TYPES):
             weights_to_download.extend(["models--CIDAS--clipseg-rd64-refined"])
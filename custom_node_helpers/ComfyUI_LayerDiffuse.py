@@ -1,5 +1,19 @@
 from custom_node_helper import CustomNodeHelper
 
+APPLY_NODES = (
+    "LayeredDiffusionApply",
+    "LayeredDiffusionJointApply",
+    "LayeredDiffusionCondApply",
+    "LayeredDiffusionCondJointApply",
+)
+DIFF_APPLY_NODE = "LayeredDiffusionDiffApply"
+DECODE_NODES = (
+    "LayeredDiffusionDecode",
+    "LayeredDiffusionDecodeRGBA",
+    "LayeredDiffusionDecodeSplit",
+)
+NODE_TYPES = APPLY_NODES + (DIFF_APPLY_NODE,) + DECODE_NODES
+
 
 class ComfyUI_LayerDiffuse(CustomNodeHelper):
     @staticmethod
@@ -33,29 +47,18 @@ class ComfyUI_LayerDiffuse(CustomNodeHelper):
 
         return vae_weights_map.get(config, [])
 
+    @staticmethod
+    def class_types():
+        return list(NODE_TYPES)
+
     @staticmethod
     def add_weights(weights_to_download, node):
-        if node.is_type_in(
-            [
-                "LayeredDiffusionApply",
-                "LayeredDiffusionJointApply",
-                "LayeredDiffusionCondApply",
-                "LayeredDiffusionCondJointApply",
-            ]
-        ):
+        if node.is_type_in(APPLY_NODES):
             config = node.input("config")
             weights_to_download.extend(ComfyUI_LayerDiffuse.get_config_weights(config))
-        elif node.is_type(
-            "LayeredDiffusionDiffApply",
-        ):
+        elif node.is_type(DIFF_APPLY_NODE):
             config = f"Diff, {node.input('config')}"
             weights_to_download.extend(ComfyUI_LayerDiffuse.get_config_weights(config))
-        elif node.is_type_in(
-            [
-                "LayeredDiffusionDecode",
-                "LayeredDiffusionDecodeRGBA",
-                "LayeredDiffusionDecodeSplit",
-            ]
-        ):
+        elif node.is_type_in(DECODE_NODES):
             sd_version = node.input("sd_version")
             weights_to_download.extend(ComfyUI_LayerDiffuse.get_vae_weights(sd_version))
@@ -1,5 +1,12 @@
 from custom_node_helper import CustomNodeHelper
 
+NODE_TYPES = (
+    "ReActorFaceSwap",
+    "ReActorLoadFaceModel",
+    "ReActorSaveFaceModel",
+    "ReActorFaceSwapOpt",
+)
+
 
 class ComfyUI_Reactor(CustomNodeHelper):
     facedetection_weights = {
@@ -9,16 +16,13 @@ class ComfyUI_Reactor(CustomNodeHelper):
         "YOLOv5n": "yolov5n-face.pth",
     }
 
+    @staticmethod
+    def class_types():
+        return list(NODE_TYPES)
+
     @staticmethod
     def add_weights(weights_to_download, node):
-        if node.is_type_in(
-            [
-                "ReActorFaceSwap",
-                "ReActorLoadFaceModel",
-                "ReActorSaveFaceModel",
-                "ReActorFaceSwapOpt",
-            ]
-        ):
+        if node.is_type_in(NODE_TYPES):
             weights_to_download.append("models/buffalo_l")
             weights_to_download.append("parsing_parsenet.pth")
             weights_to_download.append("vit-base-nsfw-detector")
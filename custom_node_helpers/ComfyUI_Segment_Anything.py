@@ -12,16 +12,20 @@ MODEL_WEIGHTS = {
     "GroundingDINO_SwinB (938MB)": "groundingdino_swinb_cogcoor.pth",
 }
 
+NODE_TYPES = (
+    "SAMModelLoader (segment anything)",
+    "GroundingDinoModelLoader (segment anything)",
+)
+
 
 class ComfyUI_Segment_Anything(CustomNodeHelper):
+    @staticmethod
+    def class_types():
+        return list(NODE_TYPES)
+
     @staticmethod
     def add_weights(weights_to_download, node):
-        if node.is_type_in(
-            [
-                "SAMModelLoader (segment anything)",
-                "GroundingDinoModelLoader (segment anything)",
-            ]
-        ):
+        if node.is_type_in(NODE_TYPES):
             model_name = node.input("model_name")
             if model_name in MODEL_WEIGHTS:
                 weights_to_download.append(MODEL_WEIGHTS[model_name])
@@ -1,10 +1,16 @@
 from custom_node_helper import CustomNodeHelper
 
+NODE_TYPES = ("ttN imageREMBG",)
+
 
 class ComfyUI_tinyterraNodes(CustomNodeHelper):
+    @staticmethod
+    def class_types():
+        return list(NODE_TYPES)
+
     @staticmethod
     def check_for_unsupported_nodes(node):
-        if node.is_type("ttN imageREMBG"):
+        if node.is_type_in(NODE_TYPES):
             raise ValueError(
                 "imageREMBG node is not supported in tinyterraNodes. Recommend using RemBGSession from ComfyUI_Essentials"
             )
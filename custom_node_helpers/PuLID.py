@@ -1,41 +1,45 @@
+import os
 from custom_node_helper import CustomNodeHelper
 from config import config
 
 HUGGINGFACE_CACHE_PATH = "/root/.cache/huggingface/hub"
 FACEXLIB_PATH = f"{config['MODELS_PATH']}/facexlib"
-BASE_FILE_PATH = "https://weights.replicate.delivery/default/comfy-ui"
 
 facexlib_models = [
     "detection_Resnet50_Final.pth",
     "parsing_bisenet.pth",
     "parsing_parsenet.pth",
 ]
+# Keyed apart from the manifest's FACEDETECTION weights of the same name, which
+# go to another directory. The facexlib/ subfolder puts them in FACEXLIB_PATH.
+FACEXLIB_WEIGHTS = {f"facexlib/{file}": file for file in facexlib_models}
+
+EVA_CLIP_LOADERS = ("PulidEvaClipLoader", "PulidFluxEvaClipLoader")
+APPLY_NODES = ("ApplyPulid", "ApplyPulidFlux")
+INSIGHTFACE_LOADERS = ("PulidInsightFaceLoader", "PulidFluxInsightFaceLoader")
+NODE_TYPES = EVA_CLIP_LOADERS + APPLY_NODES + INSIGHTFACE_LOADERS
 
 
 class PuLID(CustomNodeHelper):
     @staticmethod
-    def add_weights(weights_to_download, node):
-        if node.is_type_in(
-            [
-                "PulidEvaClipLoader",
-                "PulidFluxEvaClipLoader",
-                "ApplyPulid",
-                "ApplyPulidFlux",
-            ]
-        ):
-            from weights_downloader import WeightsDownloader
-
-            weights_downloader = WeightsDownloader()
+    def weights_map(base_url):
+        return {
+            weight_str: {
+                "url": f"{base_url}/facedetection/{file}.tar",
+                "dest": os.path.dirname(FACEXLIB_PATH),
+            }
+            for weight_str, file in FACEXLIB_WEIGHTS.items()
+        }
 
-            if node.is_type_in(["PulidEvaClipLoader", "PulidFluxEvaClipLoader"]):
-                weights_to_download.append("EVA02_CLIP_L_336_psz14_s6B.pt")
+    @staticmethod
+    def class_types():
+        return list(NODE_TYPES)
 
-            if node.is_type_in(["ApplyPulid", "ApplyPulidFlux"]):
-                for file in facexlib_models:
-                    weights_downloader.download_if_not_exists(
-                        file,
-                        f"{BASE_FILE_PATH}/facedetection/{file}.tar",
-                        FACEXLIB_PATH,
-                    )
-        elif node.is_type_in(["PulidInsightFaceLoader", "PulidFluxInsightFaceLoader"]):
+    @staticmethod
+    def add_weights(weights_to_download, node):
+        if node.is_type_in(EVA_CLIP_LOADERS):
+            weights_to_download.append("EVA02_CLIP_L_336_psz14_s6B.pt")
+        elif node.is_type_in(APPLY_NODES):
+            weights_to_download.extend(FACEXLIB_WEIGHTS)
+        elif node.is_type_in(INSIGHTFACE_LOADERS):
             weights_to_download.append("models/antelopev2")
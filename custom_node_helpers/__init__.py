@@ -1,11 +1,38 @@
 import os
 import sys
 import importlib
+from custom_node_helper import CustomNodeHelper
 
+# Hooks that are called once per node, with the node as their last argument
+NODE_HOOKS = ["add_weights", "check_for_unsupported_nodes"]
+
+helper_classes = []
 current_dir = os.path.dirname(os.path.abspath(__file__))
-for file in os.listdir(current_dir):
+for file in sorted(os.listdir(current_dir)):
     if file.endswith(".py") and not file.startswith("__"):
         module_name = file[:-3]
         module = importlib.import_module(f".{module_name}", package=__name__)
         class_name = module_name
         setattr(sys.modules[__name__], class_name, getattr(module, class_name))
+        helper_classes.append(getattr(module, class_name))
+
+# Built once at import: class_type -> hook -> helper methods, so a node only
+# reaches the helpers that declared its class_type
+hooks_by_class_type = {}
+hooks_for_every_node = {hook: [] for hook in NODE_HOOKS}
+
+for helper in helper_classes:
+    class_types = helper.class_types()
+    for hook in NODE_HOOKS:
+        method = getattr(helper, hook)
+        if method is getattr(CustomNodeHelper, hook):
+            continue
+        if class_types is None:
+            hooks_for_every_node[hook].append(method)
+            continue
+        for class_type in class_types:
+            hooks_by_class_type.setdefault(class_type, {}).setdefault(hook, []).append(method)
+
+
+def node_hooks(hook, class_type):
+    return hooks_by_class_type.get(class_type, {}).get(hook, []) + hooks_for_every_node[hook]
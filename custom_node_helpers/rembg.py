@@ -1,11 +1,20 @@
 from custom_node_helper import CustomNodeHelper
 
+# RemBGSession+ is in ComfyUI_essentials, Image Rembg (Remove Background) is
+# in WAS nodes
+ESSENTIALS_NODE = "RemBGSession+"
+WAS_NODE = "Image Rembg (Remove Background)"
+NODE_TYPES = (ESSENTIALS_NODE, WAS_NODE)
+
 
 class rembg(CustomNodeHelper):
+    @staticmethod
+    def class_types():
+        return list(NODE_TYPES)
+
     @staticmethod
     def add_weights(weights_to_download, node):
-        # RemBGSession+ is in ComfyUI_essentials
-        if node.is_type("RemBGSession+"):
+        if node.is_type(ESSENTIALS_NODE):
             model = node.input("model")
             model_weights = {
                 "u2net: general purpose": ["u2net.onnx"],
@@ -23,8 +32,7 @@ class rembg(CustomNodeHelper):
             if model in model_weights:
                 weights_to_download.extend(model_weights[model])
 
-        # Image Rembg (Remove Background) is in WAS nodes
-        elif node.is_type("Image Rembg (Remove Background)"):
+        elif node.is_type(WAS_NODE):
             model = node.input("model")
             if model == "sam":
                 weights_to_download.extend(
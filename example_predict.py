@@ -4,10 +4,10 @@
 import os
 import mimetypes
 import json
-import shutil
 from typing import List
 from cog import BasePredictor, Input, Path
 from comfyui import ComfyUI
+from file_staging import stage_file
 from cog_model_helpers import optimise_images
 from cog_model_helpers import seed as seed_helper
 
@@ -21,6 +21,14 @@ mimetypes.add_type("image/webp", ".webp")
 # Save your example JSON to the same directory as predict.py
 api_json_file = "workflow_api.json"
 
+# Inputs that change between predictions, as slot name -> (node id, input name).
+# Any other literal input can also be set as "<node id>.<input name>".
+WORKFLOW_SLOTS = {
+    # "prompt": ("6", "text"),
+    # "negative_prompt": ("7", "text"),
+    # "seed": ("3", "seed"),
+}
+
 # Force HF offline
 os.environ["HF_DATASETS_OFFLINE"] = "1"
 os.environ["TRANSFORMERS_OFFLINE"] = "1"
@@ -31,12 +39,15 @@ class Predictor(BasePredictor):
         self.comfyUI = ComfyUI("127.0.0.1:8188")
         self.comfyUI.start_server(OUTPUT_DIR, INPUT_DIR)
 
-        # Give a list of weights filenames to download during setup
+        # The workflow is analyzed and its weights downloaded once, here.
+        # Give a list of any extra weights filenames to download during setup.
         with open(api_json_file, "r") as file:
             workflow = json.loads(file.read())
-        self.comfyUI.handle_weights(
+        self.template = self.comfyUI.compile_workflow(
             workflow,
+            slots=WORKFLOW_SLOTS,
             weights_to_download=[],
+            pin_weights=True,
         )
 
     def filename_with_extension(self, input_file, prefix):
@@ -48,21 +59,18 @@ class Predictor(BasePredictor):
         input_file: Path,
         filename: str = "image.png",
     ):
-        shutil.copy(input_file, os.path.join(INPUT_DIR, filename))
-
-    # Update nodes in the JSON workflow to modify your workflow based on the given inputs
-    def update_workflow(self, workflow, **kwargs):
-        # Below is an example showing how to get the node you need and update the inputs
+        stage_file(str(input_file), os.path.join(INPUT_DIR, filename))
 
-        # positive_prompt = workflow["6"]["inputs"]
-        # positive_prompt["text"] = kwargs["prompt"]
+    # Fill the workflow slots based on the given inputs
+    def workflow_values(self, **kwargs):
+        # Below is an example showing how to set the slots declared in WORKFLOW_SLOTS
 
-        # negative_prompt = workflow["7"]["inputs"]
-        # negative_prompt["text"] = f"nsfw, {kwargs['negative_prompt']}"
-
-        # sampler = workflow["3"]["inputs"]
-        # sampler["seed"] = kwargs["seed"]
-        pass
+        # return {
+        #     "prompt": kwargs["prompt"],
+        #     "negative_prompt": f"nsfw, {kwargs['negative_prompt']}",
+        #     "seed": kwargs["seed"],
+        # }
+        return {}
 
     def predict(
         self,
@@ -92,20 +100,16 @@ class Predictor(BasePredictor):
             image_filename = self.filename_with_extension(image, "image")
             self.handle_input_file(image, image_filename)
 
-        with open(api_json_file, "r") as file:
-            workflow = json.loads(file.read())
-
-        self.update_workflow(
-            workflow,
+        values = self.workflow_values(
             prompt=prompt,
             negative_prompt=negative_prompt,
             image_filename=image_filename,
             seed=seed,
         )
 
-        wf = self.comfyUI.load_workflow(workflow)
+        wf = self.comfyUI.load_template(self.template, values)
         self.comfyUI.connect()
-        self.comfyUI.run_workflow(wf)
+        self.comfyUI.run_workflow(wf, cache_key=self.comfyUI.workflow_cache_key)
 
         return optimise_images.optimise_image_files(
             output_format, output_quality, self.comfyUI.get_files(OUTPUT_DIR)
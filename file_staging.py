@@ -0,0 +1,80 @@
+import os
+import uuid
+import fcntl
+import shutil
+from result_cache import input_file_sha256
+
+# Tried in order until one works. hardlink and reflink need source and
+# destination on the same filesystem; symlink is opt-in because the staged
+# input then depends on the source staying in place.
+STAGING_METHODS = [
+    method.strip()
+    for method in os.getenv("INPUT_STAGING_METHODS", "reflink,hardlink,copy").split(",")
+    if method.strip()
+]
+# From linux/fs.h: clone a whole file, sharing extents copy-on-write
+FICLONE = 0x40049409
+
+
+def reflink(source, destination):
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(destination)
+            raise
+
+
+def hardlink(source, destination):
+    os.link(source, destination)
+
+
+def symlink(source, destination):
+    os.symlink(os.path.abspath(source), destination)
+
+
+def copy(source, destination):
+    shutil.copy2(source, destination)
+
+
+STAGING_FUNCTIONS = {
+    "reflink": reflink,
+    "hardlink": hardlink,
+    "symlink": symlink,
+    "copy": copy,
+}
+
+
+def is_identical(source, destination):
+    if not os.path.isfile(destination):
+        return False
+    if os.path.samefile(source, destination):
+        return True
+    if os.path.getsize(source) != os.path.getsize(destination):
+        return False
+    # A copied input with the same size is compared by content. The hashes
+    # are memoized on each file's stat, so only the first check of an
+    # unchanged pair reads the files.
+    return input_file_sha256(source) == input_file_sha256(destination)
+
+
+def stage_file(source, destination, methods=None):
+    # Makes destination a file with source's content as cheaply as the
+    # filesystem allows. Returns the method used, or "unchanged" when an
+    # identical file is already there.
+    if is_identical(source, destination):
+        return "unchanged"
+
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    temp_path = f"{destination}.{uuid.uuid4().hex}.tmp"
+    methods = methods or STAGING_METHODS
+    for method in methods:
+        try:
+            STAGING_FUNCTIONS[method](source, temp_path)
+        except OSError:
+            continue
+        os.replace(temp_path, destination)
+        return method
+
+    raise OSError(f"Could not stage {source} to {destination} with {', '.join(methods)}")
@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from urllib.parse import urlparse
+from file_staging import stage_file
+from input_downloader import DownloadError
+
+INPUT_CACHE_PATH = os.getenv("INPUT_CACHE_PATH", "/tmp/input_cache")
+INPUT_CACHE_MAX_BYTES = int(os.getenv("INPUT_CACHE_MAX_BYTES", str(2 * 1024**3)))
+# Entries validated within this many seconds are used without a request
+INPUT_CACHE_FRESH_SECONDS = float(os.getenv("INPUT_CACHE_FRESH_SECONDS", "300"))
+
+
+def url_key(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def input_filename(url):
+    # Two URLs with the same basename must not overwrite each other in the
+    # input directory, so the name carries a short hash of the full URL
+    basename = os.path.basename(urlparse(url).path) or "input"
+    return f"{url_key(url)[:12]}_{basename}"
+
+
+class InputCache:
+    # Persistent store of downloaded inputs keyed by URL. Entries remember the
+    # ETag and Last-Modified they were served with, so a stale entry is
+    # revalidated with a conditional request instead of downloaded again.
+    lock = threading.Lock()
+
+    def __init__(
+        self,
+        downloader,
+        path=INPUT_CACHE_PATH,
+        max_bytes=INPUT_CACHE_MAX_BYTES,
+        fresh_seconds=INPUT_CACHE_FRESH_SECONDS,
+    ):
+        self.downloader = downloader
+        self.path = path
+        self.max_bytes = max_bytes
+        self.fresh_seconds = fresh_seconds
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def data_path(self, key):
+        return os.path.join(self.path, f"{key}.data")
+
+    def entry_path(self, key):
+        return os.path.join(self.path, f"{key}.json")
+
+    def read_entry(self, key):
+        try:
+            with open(self.entry_path(key), "r") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if not os.path.exists(self.data_path(key)):
+            return None
+        return entry
+
+    def write_entry(self, key, entry):
+        temp_path = f"{self.entry_path(key)}.{uuid.uuid4().hex}"
+        with open(temp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(temp_path, self.entry_path(key))
+
+    def fetch(self, url, destination):
+        if not self.enabled:
+            return self.downloader.download(url, destination)
+
+        os.makedirs(self.path, exist_ok=True)
+        key = url_key(url)
+        entry = self.read_entry(key)
+
+        if entry and time.time() - entry["validated"] < self.fresh_seconds:
+            self.hits += 1
+            print(f"✅ {destination} (cached)")
+        else:
+            headers = {}
+            if entry and entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry and entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+            # Without a validator a conditional request cannot return 304
+            if not headers:
+                entry = None
+
+            response_headers = self.downloader.download(url, self.data_path(key), headers)
+            if response_headers is None:
+                # A 304 only confirms a copy we offered validators for; with
+                # no entry there is nothing on disk to keep using
+                if entry is None:
+                    raise DownloadError("304 Not Modified for an unconditional request")
+                self.revalidated += 1
+                print(f"✅ {destination} (revalidated)")
+            else:
+                self.misses += 1
+                entry = {
+                    "url": url,
+                    "etag": response_headers.get("ETag"),
+                    "last_modified": response_headers.get("Last-Modified"),
+                    "size": os.path.getsize(self.data_path(key)),
+                }
+            entry["validated"] = time.time()
+            self.write_entry(key, entry)
+
+        stage_file(self.data_path(key), destination)
+        # The metadata file's mtime is the entry's last use for LRU eviction
+        os.utime(self.entry_path(key))
+        with InputCache.lock:
+            self.evict(self.max_bytes)
+        return destination
+
+    def evict(self, budget):
+        entries = []
+        for filename in os.listdir(self.path):
+            if not filename.endswith(".json"):
+                continue
+            key = filename[: -len(".json")]
+            data_path = self.data_path(key)
+            if os.path.exists(data_path):
+                entries.append(
+                    (os.path.getmtime(self.entry_path(key)), os.path.getsize(data_path), key)
+                )
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= budget:
+                break
+            for path in [self.entry_path(key), self.data_path(key)]:
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= size
+
+    def stats(self):
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses}
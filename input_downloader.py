@@ -0,0 +1,102 @@
+import os
+import time
+import uuid
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+INPUT_DOWNLOAD_CONCURRENCY = int(os.getenv("INPUT_DOWNLOAD_CONCURRENCY", "4"))
+INPUT_DOWNLOAD_MAX_BYTES = int(os.getenv("INPUT_DOWNLOAD_MAX_BYTES", str(512 * 1024**2)))
+# Seconds allowed for a whole file, on top of the connect/read timeouts
+INPUT_DOWNLOAD_TIMEOUT = float(os.getenv("INPUT_DOWNLOAD_TIMEOUT", "120"))
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 30
+CHUNK_SIZE = 1024 * 1024
+
+
+class DownloadError(Exception):
+    pass
+
+
+class InputDownloader:
+    # Fetches remote workflow inputs a few at a time. Each body is streamed to
+    # a temp file next to its destination and renamed into place once
+    # complete, so a partial download is never picked up as an input.
+    def __init__(
+        self,
+        concurrency=INPUT_DOWNLOAD_CONCURRENCY,
+        max_bytes=INPUT_DOWNLOAD_MAX_BYTES,
+        timeout=INPUT_DOWNLOAD_TIMEOUT,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=self.concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def download(self, url, destination, headers=None):
+        # Returns the response headers, or None when a conditional request
+        # came back 304 Not Modified and nothing was written
+        print(f"Downloading {url} to {destination}")
+        start = time.time()
+        deadline = start + self.timeout
+        temp_path = f"{destination}.{uuid.uuid4().hex}.part"
+        size = 0
+        try:
+            with self.session.get(
+                url,
+                headers=headers,
+                stream=True,
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+            ) as response:
+                if response.status_code == 304:
+                    return None
+                response.raise_for_status()
+                content_length = int(response.headers.get("Content-Length") or 0)
+                if content_length > self.max_bytes:
+                    raise DownloadError(
+                        f"{content_length} bytes is over the {self.max_bytes} byte limit"
+                    )
+
+                with open(temp_path, "wb") as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise DownloadError(f"over the {self.max_bytes} byte limit")
+                        if time.time() > deadline:
+                            raise DownloadError(f"took longer than {self.timeout}s")
+                        f.write(chunk)
+                response_headers = response.headers
+            os.replace(temp_path, destination)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        elapsed = max(time.time() - start, 1e-6)
+        print(
+            f"✅ {destination} ({size / 1024**2:.2f}MB in {elapsed:.2f}s, {size / 1024**2 / elapsed:.2f}MB/s)"
+        )
+        return response_headers
+
+    def download_all(self, downloads, fetch=None):
+        # downloads is a dict of url -> destination. Returns url -> error for
+        # every download that failed.
+        fetch_file = fetch or self.download
+        errors = {}
+        if not downloads:
+            return errors
+
+        def fetch_one(url, destination):
+            try:
+                fetch_file(url, destination)
+            except (requests.exceptions.RequestException, DownloadError, OSError) as e:
+                print(f"❌ Error downloading {url}: {e}")
+                errors[url] = e
+
+        workers = min(self.concurrency, len(downloads))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for url, destination in downloads.items():
+                executor.submit(fetch_one, url, destination)
+        return errors
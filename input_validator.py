@@ -0,0 +1,229 @@
+import os
+import struct
+
+# Limits for inputs, checked from file headers before a job is queued
+INPUT_MAX_BYTES = int(os.getenv("INPUT_MAX_BYTES", str(512 * 1024**2)))
+INPUT_MAX_PIXELS = int(os.getenv("INPUT_MAX_PIXELS", str(50_000_000)))
+INPUT_MAX_DIMENSION = int(os.getenv("INPUT_MAX_DIMENSION", "16384"))
+INPUT_MAX_VIDEO_SECONDS = float(os.getenv("INPUT_MAX_VIDEO_SECONDS", "600"))
+INPUT_MAX_VIDEO_FRAMES = int(os.getenv("INPUT_MAX_VIDEO_FRAMES", "20000"))
+
+IMAGE_EXTENSIONS = [".png", ".jpg", ".jpeg", ".webp"]
+VIDEO_EXTENSIONS = [".mp4", ".webm"]
+# Enough for the PNG, WebP and WebM headers; JPEG and MP4 are walked by seeking
+HEADER_BYTES = 64 * 1024
+# JPEG start-of-frame markers; C4, C8 and CC are other segment types
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+MP4_CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+
+class InputInfo:
+    def __init__(self, format, width=None, height=None, seconds=None, frames=None):
+        self.format = format
+        self.width = width
+        self.height = height
+        self.seconds = seconds
+        self.frames = frames
+
+    @property
+    def is_video(self):
+        return self.format in ["mp4", "webm"]
+
+
+def png_info(header):
+    width, height = struct.unpack(">II", header[16:24])
+    return InputInfo("png", width, height)
+
+
+def jpeg_info(f, file_size):
+    # Phone photos carry large EXIF and ICC segments before the frame header,
+    # so the segments are skipped by seeking rather than read
+    offset = 2
+    while offset + 9 <= file_size:
+        f.seek(offset)
+        marker_bytes = f.read(4)
+        if marker_bytes[0] != 0xFF:
+            raise ValueError("corrupt JPEG marker")
+        marker = marker_bytes[1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        length = struct.unpack(">H", marker_bytes[2:4])[0]
+        if marker in JPEG_SOF_MARKERS:
+            f.read(1)
+            height, width = struct.unpack(">HH", f.read(4))
+            return InputInfo("jpeg", width, height)
+        offset += 2 + length
+    raise ValueError("no JPEG frame header")
+
+
+def webp_info(header):
+    chunk = header[12:16]
+    if chunk == b"VP8 ":
+        width, height = struct.unpack("<HH", header[26:30])
+        return InputInfo("webp", width & 0x3FFF, height & 0x3FFF)
+    if chunk == b"VP8L":
+        bits = struct.unpack("<I", header[21:25])[0]
+        return InputInfo("webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+    if chunk == b"VP8X":
+        width = int.from_bytes(header[24:27], "little") + 1
+        height = int.from_bytes(header[27:30], "little") + 1
+        return InputInfo("webp", width, height)
+    raise ValueError(f"unknown WebP chunk {chunk!r}")
+
+
+def mp4_boxes(f, start, end):
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        size, box_type = struct.unpack(">I4s", f.read(8))
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            raise ValueError("corrupt MP4 box")
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+
+def mp4_info(f, file_size):
+    info = InputInfo("mp4")
+
+    def walk(start, end, track):
+        for box_type, body, box_end in mp4_boxes(f, start, end):
+            f.seek(body)
+            if box_type in MP4_CONTAINER_BOXES:
+                child_track = {} if box_type == b"trak" else track
+                walk(body, box_end, child_track)
+                if box_type == b"trak" and child_track.get("handler") == b"vide":
+                    info.width = info.width or child_track.get("width")
+                    info.height = info.height or child_track.get("height")
+                    info.frames = info.frames or child_track.get("frames")
+            elif box_type == b"mvhd":
+                version = f.read(1)[0]
+                f.read(3)
+                if version == 1:
+                    _, _, timescale, duration = struct.unpack(">QQIQ", f.read(28))
+                else:
+                    _, _, timescale, duration = struct.unpack(">IIII", f.read(16))
+                if timescale:
+                    info.seconds = duration / timescale
+            elif box_type == b"tkhd":
+                # Width and height are the last two 16.16 fixed point fields
+                f.seek(box_end - 8)
+                width, height = struct.unpack(">II", f.read(8))
+                track["width"], track["height"] = width >> 16, height >> 16
+            elif box_type == b"hdlr":
+                f.read(8)
+                track["handler"] = f.read(4)
+            elif box_type == b"stsz":
+                f.read(8)
+                track["frames"] = struct.unpack(">I", f.read(4))[0]
+
+    walk(0, file_size, {})
+    if info.seconds is None:
+        raise ValueError("no MP4 movie header")
+    return info
+
+
+def ebml_varint(data, offset, keep_marker=False):
+    first = data[offset]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8:
+        raise ValueError("corrupt WebM element")
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in data[offset + 1 : offset + length]:
+        value = (value << 8) | byte
+    return value, offset + length
+
+
+def webm_info(header):
+    info = InputInfo("webm")
+    timecode_scale = 1_000_000
+    duration = None
+    # Master elements we descend into: Segment, Info, Tracks, TrackEntry, Video
+    masters = {0x18538067, 0x1549A966, 0x1654AE6B, 0xAE, 0xE0}
+    offset = 0
+    while offset < len(header) - 2:
+        element_id, offset = ebml_varint(header, offset, keep_marker=True)
+        size, offset = ebml_varint(header, offset)
+        if element_id in masters:
+            continue
+        data = header[offset : offset + size]
+        if element_id == 0x2AD7B1:
+            timecode_scale = int.from_bytes(data, "big")
+        elif element_id == 0x4489:
+            duration = struct.unpack(">f" if size == 4 else ">d", data)[0]
+        elif element_id == 0xB0:
+            info.width = int.from_bytes(data, "big")
+        elif element_id == 0xBA:
+            info.height = int.from_bytes(data, "big")
+        elif element_id == 0x1F43B675:
+            # First Cluster: everything we need comes before the media data
+            break
+        offset += size
+
+    if duration is not None:
+        info.seconds = duration * timecode_scale / 1e9
+    return info
+
+
+def sniff(path):
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.read(HEADER_BYTES)
+        if header.startswith(b"\x89PNG\r\n\x1a\n") and header[12:16] == b"IHDR":
+            return png_info(header)
+        if header.startswith(b"\xff\xd8\xff"):
+            return jpeg_info(f, file_size)
+        if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+            return webp_info(header)
+        if header[4:8] == b"ftyp":
+            return mp4_info(f, file_size)
+        if header.startswith(b"\x1a\x45\xdf\xa3"):
+            return webm_info(header)
+    raise ValueError("not a PNG, JPEG, WebP, MP4 or WebM file")
+
+
+def validate_input_file(path):
+    # Returns None if the file is acceptable, or the reason it is not. Only
+    # images and videos are checked.
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in IMAGE_EXTENSIONS + VIDEO_EXTENSIONS:
+        return None
+
+    file_size = os.path.getsize(path)
+    if file_size == 0:
+        return "file is empty"
+    if file_size > INPUT_MAX_BYTES:
+        return f"{file_size} bytes is over the {INPUT_MAX_BYTES} byte limit"
+
+    try:
+        info = sniff(path)
+    except (ValueError, IndexError, struct.error) as e:
+        return f"unreadable header: {e}"
+
+    # The format comes from the content, since LoadImage detects it the same
+    # way, but an image cannot stand in for a video or the other way round
+    if extension in VIDEO_EXTENSIONS and not info.is_video:
+        return f"expected a video, found {info.format}"
+    if extension in IMAGE_EXTENSIONS and info.is_video:
+        return f"expected an image, found {info.format}"
+
+    if info.width is not None and info.height is not None:
+        if not info.width or not info.height:
+            return f"invalid dimensions {info.width}x{info.height}"
+        if max(info.width, info.height) > INPUT_MAX_DIMENSION:
+            return f"{info.width}x{info.height} is over the {INPUT_MAX_DIMENSION}px limit"
+        if info.width * info.height > INPUT_MAX_PIXELS:
+            return f"{info.width}x{info.height} is over the {INPUT_MAX_PIXELS} pixel limit"
+    if info.seconds is not None and info.seconds > INPUT_MAX_VIDEO_SECONDS:
+        return f"{info.seconds:.1f}s is over the {INPUT_MAX_VIDEO_SECONDS}s limit"
+    if info.frames is not None and info.frames > INPUT_MAX_VIDEO_FRAMES:
+        return f"{info.frames} frames is over the {INPUT_MAX_VIDEO_FRAMES} frame limit"
+    return None
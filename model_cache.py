@@ -0,0 +1,371 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import socket
+import threading
+import weights_integrity
+from collections import Counter
+import weights_store
+from contextlib import contextmanager
+from config import config
+
+# Bytes of weights kept under MODELS_PATH. 0 keeps everything.
+MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", "0"))
+# With a shared weights store the index lives in it, covering every worker
+MODEL_CACHE_INDEX_PATH = os.getenv(
+    "MODEL_CACHE_INDEX_PATH",
+    os.path.join(weights_store.WEIGHTS_STORE_PATH or config["MODELS_PATH"], ".model_cache.json"),
+)
+# Seconds a weight's last use can wait in memory before it is written to the
+# index. Any other change to the index writes it sooner.
+MODEL_CACHE_FLUSH_SECONDS = float(os.getenv("MODEL_CACHE_FLUSH_SECONDS", "60"))
+# With a shared weights store, weights used this recently are not evicted,
+# since another worker may be about to load them
+MODEL_CACHE_GRACE_SECONDS = float(os.getenv("MODEL_CACHE_GRACE_SECONDS", "900"))
+# Weights that are never evicted, on top of those pinned by workflows
+MODEL_CACHE_PINNED_WEIGHTS = [
+    weight.strip()
+    for weight in os.getenv("MODEL_CACHE_PINNED_WEIGHTS", "").split(",")
+    if weight.strip()
+]
+# Seconds another worker's pins are honoured after it last wrote the index,
+# so the pins of a worker that stopped, or was reconfigured, run out
+MODEL_CACHE_PIN_SECONDS = float(os.getenv("MODEL_CACHE_PIN_SECONDS", "86400"))
+# Names this process's pins in a shared index
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+# "quick" checks sizes and safetensors headers before a weight is used; "off"
+# trusts whatever is on disk
+WEIGHTS_VERIFY = os.getenv("WEIGHTS_VERIFY", "quick")
+# Seconds between background passes that hash every weight. 0 disables them.
+WEIGHTS_VERIFY_INTERVAL = float(os.getenv("WEIGHTS_VERIFY_INTERVAL", "0"))
+
+
+def delete_path(path):
+    if os.path.islink(path):
+        os.remove(path)
+    elif os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def path_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                pass
+    return total
+
+
+class ModelCache:
+    # Keeps the downloaded weights under a byte budget. Every weight used or
+    # downloaded is recorded in an index with its size and last use, and the
+    # least recently used ones are deleted to make room for new downloads.
+    # Pinned weights and the weights of the job being prepared are kept.
+    # Each process pins what its own config asks for. The pins are recorded
+    # in the index under the worker's name each time it writes, so workers
+    # sharing a weights store keep each other's pinned weights until those
+    # pins run out.
+    #
+    # The index also holds the size and sha256 of each downloaded file, so a
+    # weight that was damaged on disk is found and downloaded again before a
+    # job tries to load it.
+    shared_instance = None
+    shared_lock = threading.Lock()
+    lock = threading.Lock()
+
+    def __init__(self, max_bytes=MODEL_CACHE_MAX_BYTES, index_path=MODEL_CACHE_INDEX_PATH):
+        self.max_bytes = max_bytes
+        self.index_path = index_path
+        self.entries = self.read_index()["entries"]
+        self.pinned = set(MODEL_CACHE_PINNED_WEIGHTS)
+        # Weights pinned by other workers sharing the index
+        self.shared_pins = set()
+        # weight_str -> jobs in this process that are about to load it
+        self.in_use = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.repairs = 0
+        # path -> (weight_str, last_used) not yet written to the index
+        self.pending_uses = {}
+        self.flushed_at = time.time()
+        # File path -> (size, mtime_ns) when it last passed the quick check
+        self.verified = {}
+
+        if WEIGHTS_VERIFY_INTERVAL > 0:
+            self.start_background_verification()
+
+    @classmethod
+    def shared(cls):
+        # One per process, since every server shares the models directory
+        with cls.shared_lock:
+            if cls.shared_instance is None:
+                cls.shared_instance = cls()
+            return cls.shared_instance
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def read_index(self):
+        # {"entries": {path: entry}, "pins": {worker: {"weights": [...], "updated": ...}}}
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            index = {}
+        # Indexes from before pins were shared hold the entries alone
+        if "entries" not in index:
+            index = {"entries": index}
+        index.setdefault("pins", {})
+        return index
+
+    def write_index(self, pins):
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        temp_path = f"{self.index_path}.{uuid.uuid4().hex}"
+        with open(temp_path, "w") as f:
+            json.dump({"entries": self.entries, "pins": pins}, f)
+        os.replace(temp_path, self.index_path)
+
+    def current_pins(self, pins):
+        # Drops pins that ran out and renews this worker's own
+        now = time.time()
+        pins = {
+            worker: record
+            for worker, record in pins.items()
+            if worker != WORKER_ID and now - record.get("updated", 0) < MODEL_CACHE_PIN_SECONDS
+        }
+        self.shared_pins = {weight for record in pins.values() for weight in record.get("weights", [])}
+        if self.pinned:
+            pins[WORKER_ID] = {"weights": sorted(self.pinned), "updated": now}
+        return pins
+
+    @contextmanager
+    def updating(self):
+        # Holds the index for a change. Workers sharing a weights store write
+        # the same index, so it is read again under a file lock first.
+        with ModelCache.lock, weights_store.file_lock(f"{self.index_path}.lock"):
+            index = self.read_index()
+            self.entries = index["entries"]
+            self.current_pins(index["pins"])
+            self.apply_pending_uses()
+            yield
+            self.write_index(self.current_pins(index["pins"]))
+
+    def pin(self, weight_strs):
+        with self.updating():
+            self.pinned.update(weight_strs)
+
+    def unpin(self, weight_strs):
+        with self.updating():
+            self.pinned.difference_update(weight_strs)
+
+    def hold(self, weight_strs):
+        # Keeps weights from eviction until they are released, covering a
+        # job from the moment its weights are checked until it has run, while
+        # other servers in the process make room for their own downloads
+        with ModelCache.lock:
+            self.in_use.update(weight_strs)
+
+    def release(self, weight_strs):
+        with ModelCache.lock:
+            self.in_use.subtract(weight_strs)
+            self.in_use = +self.in_use
+
+    def is_pinned(self, weight_str):
+        return weight_str in self.pinned or weight_str in self.shared_pins
+
+    def used(self, weight_str, path):
+        # A weight that was already on disk. Only eviction needs to know when
+        # it was used, so without a budget nothing is recorded, and with one
+        # the use is kept in memory and written out with the next change.
+        with ModelCache.lock:
+            self.hits += 1
+            if not self.enabled:
+                return
+            self.pending_uses[path] = (weight_str, time.time())
+            due = time.time() - self.flushed_at >= MODEL_CACHE_FLUSH_SECONDS
+        if due:
+            with self.updating():
+                pass
+
+    def apply_pending_uses(self):
+        # Call while updating the index. Files from before the index existed,
+        # such as those baked into the image, are added here.
+        for path, (weight_str, last_used) in self.pending_uses.items():
+            if not os.path.exists(path):
+                continue
+            entry = self.entries.get(path)
+            if entry is None:
+                entry = self.entries[path] = {"weight": weight_str, "size": path_size(path)}
+            entry["last_used"] = max(entry.get("last_used", 0), last_used)
+        self.pending_uses = {}
+        self.flushed_at = time.time()
+
+    def missed(self):
+        with ModelCache.lock:
+            self.misses += 1
+
+    def added(self, weight_str, path, files=None):
+        # files is {path: {"size": ..., "sha256": ...}} as recorded while
+        # downloading
+        with self.updating():
+            self.entries[path] = {
+                "weight": weight_str,
+                "size": path_size(path),
+                "last_used": time.time(),
+                "files": {os.path.realpath(f): record for f, record in (files or {}).items()},
+            }
+
+    def removed(self, path):
+        with self.updating():
+            self.entries.pop(path, None)
+
+    def reserve(self, size, keep=()):
+        # Frees space for size more bytes before a download starts
+        with self.updating():
+            self.evict(size, keep=set(keep))
+
+    def total_bytes(self):
+        return sum(entry["size"] for entry in self.entries.values())
+
+    def evict(self, size, keep):
+        # Call while updating the index. A weight that another thread or
+        # worker holds the lock of, to download or repair it, is skipped
+        # rather than waited for, as that worker may be waiting on the index.
+        if not self.enabled:
+            return
+        for path in [path for path in self.entries if not os.path.exists(path)]:
+            del self.entries[path]
+
+        total = self.total_bytes()
+        recent = time.time() - MODEL_CACHE_GRACE_SECONDS if weights_store.WEIGHTS_STORE_PATH else None
+        candidates = sorted(
+            (entry["last_used"], path)
+            for path, entry in self.entries.items()
+            if entry["weight"] not in keep and not self.is_pinned(entry["weight"])
+            and not self.in_use[entry["weight"]]
+            and (recent is None or entry["last_used"] < recent)
+        )
+        for _, path in candidates:
+            if total + size <= self.max_bytes:
+                break
+            with weights_store.weight_lock(path, blocking=False) as locked:
+                if not locked:
+                    continue
+                entry = self.entries.pop(path)
+                delete_path(path)
+            total -= entry["size"]
+            self.evictions += 1
+            self.evicted_bytes += entry["size"]
+            print(f"🗑️ Evicted {entry['weight']} ({entry['size'] / 1024**2:.2f}MB) from the model cache")
+
+        if total + size > self.max_bytes:
+            print(
+                f"⚠️  Model cache needs {(total + size) / 1024**3:.2f}GB, over its {self.max_bytes / 1024**3:.2f}GB budget; the rest is pinned, in use or recently used"
+            )
+
+    def verify(self, path):
+        # Returns None if the weight at path looks intact, or what is wrong.
+        # Files are only read again once their size or mtime changes.
+        if WEIGHTS_VERIFY == "off":
+            return None
+        with ModelCache.lock:
+            records = dict(self.entries.get(path, {}).get("files", {}))
+
+        if not os.path.exists(path):
+            return f"{path} is missing"
+        for file_path in records:
+            if not os.path.exists(file_path):
+                return f"{file_path} is missing"
+        for file_path in weights_integrity.weight_files(path):
+            real_path = os.path.realpath(file_path)
+            # A dangling link into the store, or a file evicted or repaired
+            # meanwhile, is a problem to repair rather than an error
+            try:
+                stat = os.stat(file_path)
+                stamp = (stat.st_size, stat.st_mtime_ns)
+                if self.verified.get(real_path) == stamp:
+                    continue
+                problem = weights_integrity.quick_problem(file_path, records.get(real_path))
+            except OSError as e:
+                return f"{file_path}: {e.strerror or e}"
+            if problem:
+                return f"{file_path}: {problem}"
+            self.verified[real_path] = stamp
+        return None
+
+    def repair(self, path):
+        # Deletes a damaged weight so it is downloaded again. The weight's lock
+        # is taken before the index's, in the same order as downloads.
+        with weights_store.weight_lock(path), self.updating():
+            self.repairs += 1
+            self.entries.pop(path, None)
+            delete_path(path)
+
+    def start_background_verification(self):
+        thread = threading.Thread(target=self._verify_loop, daemon=True)
+        thread.start()
+        return thread
+
+    def _verify_loop(self):
+        while True:
+            time.sleep(WEIGHTS_VERIFY_INTERVAL)
+            self.verify_all()
+
+    def verify_all(self):
+        # Hashes every indexed weight against the sha256 recorded when it
+        # was downloaded. Weights from before the index get their hash
+        # recorded here, once they pass the quick check.
+        with ModelCache.lock:
+            paths = list(self.entries)
+        for path in paths:
+            with ModelCache.lock:
+                entry = self.entries.get(path)
+                records = dict(entry.get("files", {})) if entry else None
+            if entry is None or not os.path.exists(path):
+                continue
+
+            problem = None
+            new_records = {}
+            for file_path in weights_integrity.weight_files(path):
+                real_path = os.path.realpath(file_path)
+                record = records.get(real_path)
+                problem = weights_integrity.full_problem(file_path, record)
+                if problem:
+                    break
+                if record is None:
+                    new_records[real_path] = {
+                        "size": os.path.getsize(file_path),
+                        "sha256": weights_integrity.file_sha256(file_path),
+                    }
+
+            if problem:
+                print(f"⚠️  {entry['weight']} failed verification ({problem}), deleting it")
+                self.repair(path)
+            elif new_records:
+                with self.updating():
+                    if path in self.entries:
+                        self.entries[path].setdefault("files", {}).update(new_records)
+
+    def stats(self):
+        with ModelCache.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "evicted_bytes": self.evicted_bytes,
+                "repairs": self.repairs,
+                "bytes": self.total_bytes(),
+                "max_bytes": self.max_bytes,
+                "pinned": len(self.pinned | self.shared_pins),
+            }
@@ -0,0 +1,226 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+from result_cache import input_file_sha256
+from file_staging import stage_file
+
+NODE_CACHE_PATH = os.getenv("NODE_CACHE_PATH", "/tmp/node_cache")
+NODE_CACHE_MAX_BYTES = int(os.getenv("NODE_CACHE_MAX_BYTES", str(1024**3)))
+
+# Expensive nodes whose first output is an IMAGE. Their result can be saved
+# as a PNG and replayed through a LoadImage node on a later run.
+DEFAULT_CACHEABLE_NODES = [
+    "AutoCropFaces",
+    "Replicate black-forest-labs/flux-kontext-pro",
+    "Replicate flux-kontext-apps/multi-image-kontext-pro",
+]
+CACHEABLE_NODES = [
+    node_type.strip()
+    for node_type in os.getenv("NODE_CACHE_TYPES", ",".join(DEFAULT_CACHEABLE_NODES)).split(",")
+    if node_type.strip()
+]
+
+CAPTURE_NODE_PREFIX = "node_cache_"
+CAPTURE_SUBFOLDER = "node_cache"
+
+
+def is_link(value):
+    return (
+        isinstance(value, list)
+        and len(value) == 2
+        and isinstance(value[0], str)
+        and isinstance(value[1], int)
+    )
+
+
+class NodeCache:
+    # Disk-backed memoization of individual nodes. Each node is keyed by its
+    # class_type, its literal inputs, the content of any input file it reads
+    # and the keys of the nodes it is linked to, so a key only changes when
+    # something upstream of the node changes.
+    lock = threading.Lock()
+
+    def __init__(self, path=NODE_CACHE_PATH, max_bytes=NODE_CACHE_MAX_BYTES, cacheable_nodes=CACHEABLE_NODES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.cacheable_nodes = set(cacheable_nodes)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 and bool(self.cacheable_nodes)
+
+    def node_keys(self, workflow, input_directory):
+        keys = {}
+
+        def key(node_id):
+            if node_id in keys:
+                return keys[node_id]
+            node = workflow.get(node_id)
+            if not isinstance(node, dict):
+                keys[node_id] = None
+                return None
+
+            keys[node_id] = None  # guards against malformed, cyclic graphs
+            inputs = {}
+            for input_key, value in node.get("inputs", {}).items():
+                if is_link(value):
+                    inputs[input_key] = ["link", key(value[0]), value[1]]
+                elif isinstance(value, str) and os.path.isfile(os.path.join(input_directory, value)):
+                    inputs[input_key] = ["file", input_file_sha256(os.path.join(input_directory, value))]
+                else:
+                    inputs[input_key] = value
+
+            payload = json.dumps(
+                {"class_type": node.get("class_type"), "inputs": inputs},
+                sort_keys=True,
+                separators=(",", ":"),
+            )
+            keys[node_id] = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+            return keys[node_id]
+
+        for node_id in list(workflow.keys()):
+            key(node_id)
+        return keys
+
+    def cacheable(self, workflow):
+        # Only nodes whose consumers all read output 0 can be replaced by a
+        # LoadImage, which has the IMAGE in the same slot
+        other_slots = set()
+        for node in workflow.values():
+            if isinstance(node, dict):
+                for value in node.get("inputs", {}).values():
+                    if is_link(value) and value[1] != 0:
+                        other_slots.add(value[0])
+
+        return [
+            node_id
+            for node_id, node in workflow.items()
+            if isinstance(node, dict)
+            and node.get("class_type") in self.cacheable_nodes
+            and node_id not in other_slots
+            and not node.get("inputs", {}).get("force_rerun", False)
+        ]
+
+    def entry_path(self, key):
+        return os.path.join(self.path, f"{key}.png")
+
+    def linked_nodes(self, workflow):
+        linked = set()
+        for node in workflow.values():
+            if isinstance(node, dict):
+                for value in node.get("inputs", {}).values():
+                    if is_link(value):
+                        linked.add(value[0])
+        return linked
+
+    def needed_nodes(self, workflow, sinks):
+        needed = set()
+        pending = list(sinks)
+        while pending:
+            node_id = pending.pop()
+            if node_id in needed or not isinstance(workflow.get(node_id), dict):
+                continue
+            needed.add(node_id)
+            for value in workflow[node_id].get("inputs", {}).values():
+                if is_link(value):
+                    pending.append(value[0])
+        return needed
+
+    def apply(self, workflow, input_directory):
+        if not self.enabled:
+            return workflow
+
+        keys = self.node_keys(workflow, input_directory)
+        sinks = set(workflow.keys()) - self.linked_nodes(workflow)
+        misses = []
+        for node_id in self.cacheable(workflow):
+            key = keys.get(node_id)
+            if key is None:
+                continue
+
+            node = workflow[node_id]
+            cached_file = self.entry_path(key)
+            if not os.path.exists(cached_file):
+                misses.append(node_id)
+                continue
+
+            self.hits += 1
+            filename = f"{CAPTURE_NODE_PREFIX}{key[:16]}.png"
+            stage_file(cached_file, os.path.join(input_directory, filename))
+            os.utime(cached_file)
+            print(f"✅ Reusing cached output of node {node_id} ({node['class_type']})")
+            workflow[node_id] = {
+                "inputs": {"image": filename},
+                "class_type": "LoadImage",
+                "_meta": node.get("_meta", {}),
+            }
+
+        # A miss that only fed a node we just replaced will not run at all, so
+        # there is nothing to capture for it
+        needed = self.needed_nodes(workflow, sinks)
+        for node_id in misses:
+            if node_id not in needed:
+                continue
+            self.misses += 1
+            workflow[f"{CAPTURE_NODE_PREFIX}{node_id}"] = {
+                "inputs": {
+                    "images": [node_id, 0],
+                    "filename_prefix": f"{CAPTURE_SUBFOLDER}/{keys[node_id]}",
+                },
+                "class_type": "SaveImage",
+                "_meta": {"title": f"Node cache capture for {node_id}"},
+            }
+        return workflow
+
+    def collect(self, outputs, output_directory):
+        # Move the images saved by capture nodes into the cache and drop them
+        # from the outputs so they are never mistaken for the job's result
+        for node_id in [n for n in outputs if n.startswith(CAPTURE_NODE_PREFIX)]:
+            images = outputs.pop(node_id).get("images", [])
+            # A LoadImage can only replay a single image, so batches are not
+            # cached
+            batch = len(images) > 1
+            if batch:
+                print(f"Not caching node {node_id[len(CAPTURE_NODE_PREFIX):]}, it produced {len(images)} images")
+            for item in images:
+                path = os.path.join(output_directory, item.get("subfolder", ""), item["filename"])
+                if not os.path.exists(path):
+                    continue
+                if batch:
+                    os.remove(path)
+                    continue
+                key = item["filename"].split("_")[0]
+                size = os.path.getsize(path)
+                if size > self.max_bytes:
+                    os.remove(path)
+                    continue
+                os.makedirs(self.path, exist_ok=True)
+                with NodeCache.lock:
+                    self.evict(self.max_bytes - size)
+                    shutil.move(path, self.entry_path(key))
+
+        capture_directory = os.path.join(output_directory, CAPTURE_SUBFOLDER)
+        if os.path.isdir(capture_directory) and not os.listdir(capture_directory):
+            os.rmdir(capture_directory)
+        return outputs
+
+    def evict(self, budget):
+        entries = []
+        for filename in os.listdir(self.path):
+            path = os.path.join(self.path, filename)
+            if os.path.isfile(path):
+                entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= budget:
+                break
+            os.remove(path)
+            total -= size
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
@@ -6,100 +6,387 @@ import json
 import argparse
 import sys
 import subprocess
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from comfyui import ComfyUI
+from comfyui_pool import ComfyUIPool
+from file_staging import stage_file
 from cog_model_helpers import optimise_images
+from cog_model_helpers import normalise_images
 
 # Define temporary directories inside the container
 OUTPUT_DIR = "/tmp/outputs"
 INPUT_DIR = "/tmp/inputs"
-ALL_DIRECTORIES = [OUTPUT_DIR, INPUT_DIR, "ComfyUI/temp"]
+# Batch mode stages upcoming jobs' inputs here while the servers are busy
+STAGING_DIR = "/tmp/staging"
+
+# Job fields that hold an input image, and the filename the workflows load them as
+INPUT_IMAGES = {
+    "user_image": "guy.png",
+    "jersey_image": "jersey.png",
+    "filter_image": "filter.png",
+    "location_image": "location.png",
+}
+
+
+REQUIRED_JOB_FIELDS = ["workflow_json_file", "s3_url"]
+
+
+def validate_job(job):
+    if not isinstance(job, dict):
+        raise ValueError("A job must be a JSON object")
+    for key in REQUIRED_JOB_FIELDS:
+        if key not in job:
+            raise ValueError(f"Missing required job field: {key}")
+
+
+def stage_inputs(job, input_directory):
+    os.makedirs(input_directory, exist_ok=True)
+    for key, filename in INPUT_IMAGES.items():
+        source = job.get(key)
+        if source and Path(source).exists():
+            stage_file(source, os.path.join(input_directory, filename))
+
+    # An explicit 0 from the job keeps the original size, whatever the default
+    max_resolution = job.get("max_input_resolution")
+    if max_resolution is None:
+        max_resolution = normalise_images.DEFAULT_MAX_RESOLUTION
+    max_resolution = int(max_resolution)
+    if job.get("normalise_inputs", max_resolution > 0):
+        normalise_images.normalise_image_files(
+            input_directory,
+            max_resolution,
+            job.get("input_format") or normalise_images.DEFAULT_FORMAT,
+        )
+
+
+def upload_output(generated_file, s3_url):
+    print(f"Found generated file: {generated_file}")
+    print(f"Uploading to S3 URL: {s3_url}")
+
+    upload_command = ["aws", "s3", "cp", str(generated_file), s3_url]
+    subprocess.run(upload_command, check=True)
+
+    print("Upload to S3 successful.")
+
+
+def upload_output_bytes(image, s3_url):
+    print(f"Received {image.format} image from node {image.node_id} ({len(image.data)} bytes)")
+    print(f"Uploading to S3 URL: {s3_url}")
+
+    # "-" makes the AWS CLI stream the upload from stdin
+    upload_command = ["aws", "s3", "cp", "-", s3_url, "--content-type", f"image/{image.format}"]
+    subprocess.run(upload_command, input=image.data, check=True)
+
+    print("Upload to S3 successful.")
+
+
+def read_workflow_file(workflow_json_file):
+    with open(workflow_json_file, "r") as f:
+        return json.load(f)
+
+
+# Workflow files whose weights stay in the model cache, comma separated
+PINNED_WORKFLOWS = {
+    os.path.abspath(path.strip())
+    for path in os.getenv("MODEL_CACHE_PINNED_WORKFLOWS", "").split(",")
+    if path.strip()
+}
+
+
+# Compiled workflows, keyed by file, modification time and output mode, so
+# each workflow file is parsed and analyzed once per process
+templates = {}
+templates_lock = threading.Lock()
+
+
+def get_template(comfyUI, job):
+    path = os.path.abspath(job["workflow_json_file"])
+    output_mode = job.get("output_mode", "files")
+    key = (path, os.stat(path).st_mtime_ns, output_mode)
+    with templates_lock:
+        template = templates.get(key)
+    if template is None:
+        workflow_data = read_workflow_file(path)
+        if output_mode == "websocket":
+            comfyUI.convert_save_image_nodes(workflow_data)
+        template = comfyUI.compile_workflow(workflow_data, pin_weights=path in PINNED_WORKFLOWS)
+        with templates_lock:
+            templates[key] = template
+    return template
+
+
+def compile_pinned_workflows(pool):
+    # Pinned workflows are compiled, and their weights downloaded and pinned,
+    # before the first job arrives rather than when one first uses them
+    for path in sorted(PINNED_WORKFLOWS):
+        print(f"Loading pinned workflow {path}")
+        with pool.acquire() as comfyUI:
+            get_template(comfyUI, {"workflow_json_file": path})
+
+
+def prepare_job(job, staging_directory):
+    # Everything that does not need the server: copy the inputs aside, so this
+    # can overlap with the previous job's execution
+    if os.path.exists(staging_directory):
+        shutil.rmtree(staging_directory)
+    stage_inputs(job, staging_directory)
+    return staging_directory
+
+
+def move_staged_inputs(staging_directory, input_directory):
+    for filename in os.listdir(staging_directory):
+        os.replace(
+            os.path.join(staging_directory, filename),
+            os.path.join(input_directory, filename),
+        )
+    shutil.rmtree(staging_directory)
+
+
+def run_job(comfyUI, job, prepared=None):
+    input_directory = comfyUI.input_directory
+    output_directories = [comfyUI.output_directory, comfyUI.temp_directory]
+
+    # --- 4. Prepare Environment and Inputs ---
+    comfyUI.cleanup([input_directory, *output_directories])
+    if prepared is None:
+        stage_inputs(job, input_directory)
+    else:
+        move_staged_inputs(prepared, input_directory)
+
+    # --- 5. Load and Run Workflow ---
+    # "slots" patches literal inputs of the compiled workflow, e.g. {"231.seed": 42}
+    bypass_cache = job.get("bypass_cache", False)
+    template = get_template(comfyUI, job)
+    wf = comfyUI.load_template(template, job.get("slots"), bypass_cache=bypass_cache)
+    comfyUI.run_workflow(wf, bypass_cache=bypass_cache, cache_key=comfyUI.workflow_cache_key)
+
+    # --- 6. Process and Upload Output ---
+    if comfyUI.websocket_images:
+        upload_output_bytes(comfyUI.websocket_images[0], job["s3_url"])
+        return {"s3_url": job["s3_url"], "server": comfyUI.server_address}
+
+    output_files = comfyUI.get_files(output_directories)
+
+    if not output_files:
+        raise RuntimeError("Workflow did not generate any output files.")
+
+    # Assume the first generated file is the one we want to upload
+    generated_file = output_files[0]
+
+    # Note: Optimization logic is removed for clarity, but you can add it back here
+    # if you need to convert to webp before uploading.
+    # For now, we upload the file as-is.
+    upload_output(generated_file, job["s3_url"])
+    return {"s3_url": job["s3_url"], "server": comfyUI.server_address}
+
+
+def serve(pool, host, port):
+    # Each request holds one pooled server for the duration of its job, so up
+    # to pool.size jobs run concurrently and the rest wait for a free server.
+    class JobHandler(BaseHTTPRequestHandler):
+        def send_json(self, status, body):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self.send_json(200, {"status": "ready"})
+            elif self.path == "/stats":
+                self.send_json(200, {"servers": pool.utilization()})
+            else:
+                self.send_json(404, {"error": f"Unknown endpoint {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self.send_json(404, {"error": f"Unknown endpoint {self.path}"})
+                return
+
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                job = json.loads(self.rfile.read(length))
+                validate_job(job)
+            except ValueError as e:
+                self.send_json(400, {"status": "failed", "error": str(e)})
+                return
+
+            start = time.time()
+            try:
+                with pool.acquire() as comfyUI:
+                    result = run_job(comfyUI, job)
+            except Exception as e:
+                print(f"❌ Job failed: {e}")
+                self.send_json(
+                    500,
+                    {
+                        "status": "failed",
+                        "error": str(e),
+                        "elapsed": time.time() - start,
+                    },
+                )
+                return
+
+            print(f"✅ Job finished in {time.time() - start:.2f}s")
+            self.send_json(
+                200, {"status": "succeeded", "elapsed": time.time() - start, **result}
+            )
+
+    httpd = ThreadingHTTPServer((host, port), JobHandler)
+    print(f"Worker ready. POST jobs to http://{host}:{port}/predict")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+def run_batch(pool, batch_file, results_file):
+    with open(batch_file, "r") as f:
+        lines = [
+            (line_number, line)
+            for line_number, line in enumerate(f, start=1)
+            if line.strip()
+        ]
+
+    print(f"Running {len(lines)} jobs from {batch_file}")
+    batch_start = time.time()
+    results_lock = threading.Lock()
+    failed = 0
+
+    def process(line_number, line, results):
+        nonlocal failed
+        start = time.time()
+        record = {"line": line_number}
+        try:
+            job = json.loads(line)
+            validate_job(job)
+            record["s3_url"] = job["s3_url"]
+            prepared = prepare_job(job, os.path.join(STAGING_DIR, str(line_number)))
+        except Exception as e:
+            job = None
+            record.update({"status": "failed", "error": f"Could not prepare job: {e}"})
+
+        if job is not None:
+            try:
+                with pool.acquire() as comfyUI:
+                    record.update(run_job(comfyUI, job, prepared))
+                record["status"] = "succeeded"
+            except Exception as e:
+                record.update({"status": "failed", "error": str(e)})
+
+        record["elapsed"] = time.time() - start
+        with results_lock:
+            if record["status"] == "failed":
+                failed += 1
+                print(f"❌ Line {line_number}: {record['error']}")
+            else:
+                print(f"✅ Line {line_number} finished in {record['elapsed']:.2f}s")
+            results.write(json.dumps(record) + "\n")
+            results.flush()
+
+    # One worker more than there are servers: while every server is busy the
+    # spare worker stages the next job's inputs, then waits for a free server
+    with ThreadPoolExecutor(max_workers=pool.size + 1) as executor, open(results_file, "w") as results:
+        for line_number, line in lines:
+            executor.submit(process, line_number, line, results)
+
+    print(
+        f"Batch finished: {len(lines) - failed} succeeded, {failed} failed in {time.time() - batch_start:.2f}s"
+    )
+    pool.print_utilization()
+    print(f"Results written to {results_file}")
+    return failed
+
 
 def main():
     # --- 1. Parse All Arguments ---
     parser = argparse.ArgumentParser(description="Generate an image and upload it to S3.")
-    parser.add_argument("--workflow_json_file", type=Path, required=True)
+    parser.add_argument("--workflow_json_file", type=Path, required=False)
     parser.add_argument("--user_image", type=Path, required=False)
     parser.add_argument("--jersey_image", type=Path, required=False)
     parser.add_argument("--filter_image", type=Path, required=False)
     parser.add_argument("--location_image", type=Path, required=False)
-    
+
     # NEW: S3 URL argument
-    parser.add_argument("--s3_url", type=str, required=True, help="The destination S3 URL for the final image.")
-    
+    parser.add_argument("--s3_url", type=str, required=False, help="The destination S3 URL for the final image.")
+
     # Optional output formatting
     parser.add_argument("--output_format", type=str, default="webp")
     parser.add_argument("--output_quality", type=int, default=80)
+
+    # "websocket" receives the final image in memory instead of via the output directory
+    parser.add_argument("--output_mode", type=str, default="files", choices=["files", "websocket"])
+
+    # Optional input pre-normalisation: EXIF transpose and downscaling before LoadImage
+    parser.add_argument("--normalise_inputs", action="store_true", help="Apply EXIF orientation to input images before the workflow runs.")
+    parser.add_argument("--max_input_resolution", type=int, default=normalise_images.DEFAULT_MAX_RESOLUTION, help="Scale input images down so their longest side is at most this many pixels. 0 keeps the original size.")
+    parser.add_argument("--input_format", type=str, default=normalise_images.DEFAULT_FORMAT, choices=normalise_images.FORMAT_CHOICES)
+
+    # Re-run the workflow even if an identical job has a cached result
+    parser.add_argument("--bypass_cache", action="store_true", help="Ignore the result and node caches for this run.")
+
+    # Worker mode: keep the ComfyUI servers warm and accept jobs over HTTP
+    parser.add_argument("--serve", action="store_true", help="Run as a long-lived worker that accepts jobs on POST /predict.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address the worker listens on.")
+    parser.add_argument("--port", type=int, default=5000, help="Port the worker listens on.")
+
+    # Batch mode: drain a JSONL file of jobs through the running servers
+    parser.add_argument("--batch", type=Path, required=False, help="JSONL file with one job per line.")
+    parser.add_argument("--batch_results", type=Path, required=False, help="Where to write one result record per job. Defaults to <batch>.results.jsonl.")
+
+    # Number of ComfyUI servers, each pinned to its own slice of the CPUs
+    parser.add_argument("--servers", type=int, default=1, help="How many ComfyUI servers to run in --serve or --batch mode.")
     args = parser.parse_args()
 
+    if args.serve and args.batch:
+        parser.error("--serve and --batch cannot be used together")
+    if not (args.serve or args.batch) and (args.workflow_json_file is None or args.s3_url is None):
+        parser.error("--workflow_json_file and --s3_url are required unless --serve or --batch is used")
+    if args.servers < 1:
+        parser.error("--servers must be at least 1")
+
     # --- 2. Start Server ---
-    server_command = [
-        "python3", "/app/ComfyUI/main.py", "--listen", "0.0.0.0", "--cpu",
-        "--output-directory", OUTPUT_DIR, "--input-directory", INPUT_DIR
-    ]
-    server_process = subprocess.Popen(server_command)
-    comfyUI = ComfyUI("127.0.0.1:8188")
-    
+    pool = ComfyUIPool(args.servers if (args.serve or args.batch) else 1, OUTPUT_DIR, INPUT_DIR)
+
     try:
         # --- 3. Wait for Server ---
-        for _ in range(60):
-            if comfyUI.is_server_running():
-                print("Server is ready.")
-                break
-            time.sleep(1)
+        pool.start()
+        compile_pinned_workflows(pool)
+
+        if args.serve:
+            serve(pool, args.host, args.port)
+        elif args.batch:
+            results_file = args.batch_results or args.batch.with_suffix(".results.jsonl")
+            failed = run_batch(pool, args.batch, results_file)
+            if failed:
+                sys.exit(1)
         else:
-            raise TimeoutError("ComfyUI server did not start")
-
-        # --- 4. Prepare Environment and Inputs ---
-        comfyUI.cleanup(ALL_DIRECTORIES)
-        
-        if args.user_image and args.user_image.exists():
-            shutil.copy(args.user_image, os.path.join(INPUT_DIR, "guy.png"))
-        if args.jersey_image and args.jersey_image.exists():
-            shutil.copy(args.jersey_image, os.path.join(INPUT_DIR, "jersey.png"))
-        if args.filter_image and args.filter_image.exists():
-            shutil.copy(args.filter_image, os.path.join(INPUT_DIR, "filter.png"))
-        if args.location_image and args.location_image.exists():
-            shutil.copy(args.location_image, os.path.join(INPUT_DIR, "location.png"))
-
-        # --- 5. Load and Run Workflow ---
-        with open(args.workflow_json_file, 'r') as f:
-            workflow_data = json.load(f)
-            
-        wf = comfyUI.load_workflow(workflow_data)
-        comfyUI.connect()
-        comfyUI.run_workflow(wf)
-
-        # --- 6. Process and Upload Output ---
-        output_files = comfyUI.get_files([OUTPUT_DIR, "ComfyUI/temp"])
-
-        if not output_files:
-            raise RuntimeError("Workflow did not generate any output files.")
-
-        # Assume the first generated file is the one we want to upload
-        generated_file = output_files[0]
-        
-        # Note: Optimization logic is removed for clarity, but you can add it back here
-        # if you need to convert to webp before uploading.
-        # For now, we upload the file as-is.
-        
-        print(f"Found generated file: {generated_file}")
-        print(f"Uploading to S3 URL: {args.s3_url}")
-
-        upload_command = ["aws", "s3", "cp", str(generated_file), args.s3_url]
-        subprocess.run(upload_command, check=True)
-
-        print("Upload to S3 successful.")
-        print("\nPrediction successful.")
+            job = {
+                "workflow_json_file": args.workflow_json_file,
+                "s3_url": args.s3_url,
+                "bypass_cache": args.bypass_cache,
+                "output_mode": args.output_mode,
+                "normalise_inputs": args.normalise_inputs or args.max_input_resolution > 0,
+                "max_input_resolution": args.max_input_resolution,
+                "input_format": args.input_format,
+                **{key: getattr(args, key) for key in INPUT_IMAGES},
+            }
+            with pool.acquire() as comfyUI:
+                run_job(comfyUI, job)
+            print("\nPrediction successful.")
 
     finally:
         # --- 7. Shutdown ---
-        if server_process:
-            print("Prediction process finished. Shutting down ComfyUI server...")
-            server_process.terminate()
-            server_process.wait()
-            print("Server shut down.")
+        print("Prediction process finished. Shutting down ComfyUI server...")
+        pool.shutdown()
+        print("Server shut down.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,402 @@
+import os
+import time
+import uuid
+import shutil
+import hashlib
+import tarfile
+import threading
+import requests
+import urllib.parse
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+# Range requests made in parallel for one file
+DOWNLOAD_CONNECTIONS = int(os.getenv("DOWNLOAD_CONNECTIONS", "8"))
+DOWNLOAD_CHUNK_BYTES = int(os.getenv("DOWNLOAD_CHUNK_BYTES", str(8 * 1024**2)))
+# Shared by every download in the process. 0 leaves bandwidth unlimited.
+DOWNLOAD_MAX_BYTES_PER_SECOND = int(os.getenv("DOWNLOAD_MAX_BYTES_PER_SECOND", "0"))
+# Connections open at once across every download in the process, however
+# many downloads run side by side. 0 leaves them unlimited.
+DOWNLOAD_MAX_CONNECTIONS = int(os.getenv("DOWNLOAD_MAX_CONNECTIONS", "16"))
+POOL_SIZE = 64
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+READ_SIZE = 1024 * 1024
+RETRIES = 3
+
+
+class DownloadError(Exception):
+    pass
+
+
+class BandwidthLimiter:
+    # Token bucket shared by every connection. Readers take what they read
+    # and sleep off any debt, so the total rate stays at bytes_per_second
+    # however many connections are open.
+    def __init__(self, bytes_per_second=0):
+        self.rate = bytes_per_second
+        self.tokens = bytes_per_second
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, size):
+        if self.rate <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= size
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class Progress:
+    # Calls callback(done_bytes, total_bytes) as bytes arrive on any
+    # connection. total_bytes is 0 when the server did not say.
+    def __init__(self, total, callback=None):
+        self.total = total
+        self.done = 0
+        self.callback = callback
+        self.lock = threading.Lock()
+
+    def add(self, size):
+        with self.lock:
+            self.done += size
+            if self.callback:
+                self.callback(self.done, self.total)
+
+
+class BlockReader:
+    # File-like view of an iterator of byte blocks, for tarfile's stream mode
+    def __init__(self, blocks):
+        self.blocks = iter(blocks)
+        self.buffer = memoryview(b"")
+
+    def read(self, size=-1):
+        parts = []
+        while size < 0 or size > 0:
+            if not self.buffer:
+                block = next(self.blocks, None)
+                if block is None:
+                    break
+                self.buffer = memoryview(block)
+            part = self.buffer if size < 0 else self.buffer[:size]
+            self.buffer = self.buffer[len(part) :]
+            parts.append(bytes(part))
+            if size > 0:
+                size -= len(part)
+        return b"".join(parts)
+
+
+def member_path(destination, name):
+    # Archive members must stay inside destination
+    path = os.path.realpath(os.path.join(destination, name))
+    root = os.path.realpath(destination)
+    if os.path.isabs(name) or os.path.commonpath([root, path]) != root:
+        raise DownloadError(f"Refusing to extract {name} outside {destination}")
+    return path
+
+
+def move_into(source, destination):
+    # Renames source to destination, merging into a directory already there
+    if os.path.isdir(source) and os.path.isdir(destination) and not os.path.islink(destination):
+        for name in os.listdir(source):
+            move_into(os.path.join(source, name), os.path.join(destination, name))
+        os.rmdir(source)
+    else:
+        os.replace(source, destination)
+
+
+class RangeDownloader:
+    # Downloads large files over several HTTP range requests at once.
+    # download writes straight into a preallocated temp file; extract feeds
+    # the ranges in order through tarfile and writes each member to its
+    # final path as it arrives, so the archive itself never touches disk.
+    shared_instance = None
+    shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        connections=DOWNLOAD_CONNECTIONS,
+        chunk_size=DOWNLOAD_CHUNK_BYTES,
+        max_bytes_per_second=DOWNLOAD_MAX_BYTES_PER_SECOND,
+        max_connections=0,
+    ):
+        self.connections = max(1, connections)
+        self.chunk_size = max(READ_SIZE, chunk_size)
+        self.limiter = BandwidthLimiter(max_bytes_per_second)
+        self.slots = threading.BoundedSemaphore(max_connections) if max_connections > 0 else None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def shared(cls):
+        # One per process, so the bandwidth and connection limits cover
+        # every download
+        with cls.shared_lock:
+            if cls.shared_instance is None:
+                cls.shared_instance = cls(max_connections=DOWNLOAD_MAX_CONNECTIONS)
+            return cls.shared_instance
+
+    def acquire(self):
+        # Takes one of the process's connection slots, waiting for a free one
+        if self.slots is not None:
+            self.slots.acquire()
+
+    def release(self):
+        if self.slots is not None:
+            self.slots.release()
+
+    @contextmanager
+    def connection(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def probe(self, url, headers):
+        # Returns (url, size, response). Range requests go to the URL after
+        # redirects; response is only returned when the server ignored the
+        # range and is already sending the whole body. That response keeps
+        # the connection slot taken here until stream has read it.
+        self.acquire()
+        try:
+            response = self.session.get(
+                url,
+                headers={**headers, "Range": "bytes=0-0"},
+                stream=True,
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+            )
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError:
+                response.close()
+                raise
+
+            if response.status_code == 206:
+                total = response.headers.get("Content-Range", "").rpartition("/")[2]
+                response.close()
+                if total.isdigit():
+                    self.release()
+                    return response.url, int(total), None
+                response = self.session.get(
+                    url, headers=headers, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+                )
+                response.raise_for_status()
+        except BaseException:
+            self.release()
+            raise
+        return response.url, int(response.headers.get("Content-Length") or 0), response
+
+    def range_headers(self, url, final_url, headers):
+        # Like requests itself, don't send credentials on to another host
+        if urllib.parse.urlparse(url).hostname != urllib.parse.urlparse(final_url).hostname:
+            return {k: v for k, v in headers.items() if k.lower() != "authorization"}
+        return headers
+
+    def fetch_range(self, url, start, end, headers, write, progress):
+        # Calls write(offset, data) for bytes start..end inclusive, resuming
+        # from the last byte written when a connection drops
+        offset = start
+        for attempt in range(RETRIES):
+            try:
+                with self.connection(), self.session.get(
+                    url,
+                    headers={**headers, "Range": f"bytes={offset}-{end}"},
+                    stream=True,
+                    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                ) as response:
+                    if response.status_code != 206:
+                        raise DownloadError(
+                            f"Expected 206 for bytes {offset}-{end}, got {response.status_code}"
+                        )
+                    for data in response.iter_content(READ_SIZE):
+                        data = data[: end + 1 - offset]
+                        self.limiter.consume(len(data))
+                        write(offset, data)
+                        offset += len(data)
+                        progress.add(len(data))
+                if offset > end:
+                    return
+                raise DownloadError(f"Connection closed at byte {offset} of {start}-{end}")
+            except (requests.exceptions.RequestException, DownloadError):
+                if attempt == RETRIES - 1:
+                    raise
+                time.sleep(2**attempt)
+
+    def ranges(self, size):
+        return [
+            (start, min(start + self.chunk_size, size) - 1)
+            for start in range(0, size, self.chunk_size)
+        ]
+
+    def stream(self, response, progress):
+        # Releases the connection slot probe took for response
+        try:
+            with response:
+                for data in response.iter_content(READ_SIZE):
+                    self.limiter.consume(len(data))
+                    progress.add(len(data))
+                    yield data
+        finally:
+            self.release()
+
+    def blocks(self, url, headers=None, progress=None, connections=None):
+        # Yields the body in order while later ranges download in the
+        # background. At most connections + 1 chunks are held in memory.
+        headers = headers or {}
+        final_url, size, response = self.probe(url, headers)
+        progress = Progress(size, progress)
+        if response is not None:
+            yield from self.stream(response, progress)
+            return
+
+        headers = self.range_headers(url, final_url, headers)
+        workers = min(connections or self.connections, max(1, len(self.ranges(size))))
+
+        def fetch(start, end):
+            block = bytearray(end + 1 - start)
+
+            def write(offset, data):
+                block[offset - start : offset - start + len(data)] = data
+
+            self.fetch_range(final_url, start, end, headers, write, progress)
+            return block
+
+        pending = iter(self.ranges(size))
+        futures = deque()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                for start, end in pending:
+                    futures.append(executor.submit(fetch, start, end))
+                    if len(futures) > workers:
+                        break
+                while futures:
+                    block = futures.popleft().result()
+                    next_range = next(pending, None)
+                    if next_range:
+                        futures.append(executor.submit(fetch, *next_range))
+                    yield block
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def download(self, url, destination, headers=None, progress=None, connections=None):
+        # Returns the number of bytes written to destination
+        headers = headers or {}
+        start = time.time()
+        temp_path = f"{destination}.{uuid.uuid4().hex}.part"
+        try:
+            final_url, size, response = self.probe(url, headers)
+            tracker = Progress(size, progress)
+            if response is not None:
+                with open(temp_path, "wb") as f:
+                    for data in self.stream(response, tracker):
+                        f.write(data)
+            else:
+                headers = self.range_headers(url, final_url, headers)
+                with open(temp_path, "wb") as f:
+                    f.truncate(size)
+                    fd = f.fileno()
+
+                    def write(offset, data):
+                        os.pwrite(fd, data, offset)
+
+                    ranges = self.ranges(size)
+                    workers = min(connections or self.connections, max(1, len(ranges)))
+                    with ThreadPoolExecutor(max_workers=workers) as executor:
+                        futures = [
+                            executor.submit(
+                                self.fetch_range, final_url, s, e, headers, write, tracker
+                            )
+                            for s, e in ranges
+                        ]
+                    for future in futures:
+                        future.result()
+            os.replace(temp_path, destination)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        self.report(destination, tracker.done, start)
+        return tracker.done
+
+    def extract(self, url, destination, headers=None, progress=None, connections=None):
+        # Extracts a tar archive into destination as it downloads. Members are
+        # written to a staging directory next to destination and moved into
+        # place once the whole archive has arrived, so other workers never
+        # see a directory weight with only some of its files.
+        # Returns {path: {"size": ..., "sha256": ...}} for the extracted files,
+        # hashed on the way through so they can be verified later.
+        start = time.time()
+        os.makedirs(destination, exist_ok=True)
+        staging = f"{os.path.normpath(destination)}.{uuid.uuid4().hex}.extract"
+        extracted = {}
+        size = 0
+
+        def counted_progress(done, total):
+            nonlocal size
+            size = done
+            if progress:
+                progress(done, total)
+
+        try:
+            os.makedirs(staging)
+            blocks = self.blocks(url, headers, counted_progress, connections)
+            with tarfile.open(fileobj=BlockReader(blocks), mode="r|*") as tar:
+                for member in tar:
+                    path = member_path(staging, member.name)
+                    if member.isdir():
+                        os.makedirs(path, exist_ok=True)
+                        continue
+                    if not member.isfile():
+                        print(f"Skipping {member.name} in {url}, not a regular file")
+                        continue
+
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    sha256 = hashlib.sha256()
+                    with tar.extractfile(member) as src, open(path, "wb") as dst:
+                        for data in iter(lambda: src.read(READ_SIZE), b""):
+                            sha256.update(data)
+                            dst.write(data)
+                    final_path = os.path.join(destination, os.path.relpath(path, os.path.realpath(staging)))
+                    extracted[final_path] = {"size": member.size, "sha256": sha256.hexdigest()}
+
+            for name in os.listdir(staging):
+                move_into(os.path.join(staging, name), os.path.join(destination, name))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        self.report(destination, size, start)
+        return extracted
+
+    def report(self, destination, size, start):
+        elapsed = max(time.time() - start, 1e-6)
+        print(
+            f"✅ {destination} ({size / 1024**2:.2f}MB in {elapsed:.2f}s, {size / 1024**2 / elapsed:.2f}MB/s)"
+        )
+
+
+if __name__ == "__main__":
+    # Stands in for pget in the image build: python range_downloader.py [-x] url dest
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Download a file over parallel range requests.")
+    parser.add_argument("-x", "--extract", action="store_true", help="Extract a tar archive into dest.")
+    parser.add_argument("--connections", type=int, default=DOWNLOAD_CONNECTIONS)
+    parser.add_argument("url")
+    parser.add_argument("dest")
+    args = parser.parse_args()
+
+    downloader = RangeDownloader(connections=args.connections)
+    if args.extract:
+        downloader.extract(args.url, args.dest)
+    else:
+        downloader.download(args.url, args.dest)
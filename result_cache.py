@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "/tmp/result_cache")
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(2 * 1024**3)))
+ENTRY_FILE = "entry.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# File signature -> sha256, so unchanged inputs are hashed once per process.
+# Staging with copy2 or a hardlink keeps the source's mtime, so the inode and
+# ctime are part of the signature too. Least recently used entries go first.
+INPUT_HASH_MEMO_SIZE = 1024
+input_file_hashes = OrderedDict()
+input_file_hashes_lock = threading.Lock()
+
+
+def input_file_sha256(path):
+    stat = os.stat(path)
+    signature = (path, stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns)
+    with input_file_hashes_lock:
+        if signature in input_file_hashes:
+            input_file_hashes.move_to_end(signature)
+            return input_file_hashes[signature]
+
+    sha256 = file_sha256(path)
+    with input_file_hashes_lock:
+        input_file_hashes[signature] = sha256
+        while len(input_file_hashes) > INPUT_HASH_MEMO_SIZE:
+            input_file_hashes.popitem(last=False)
+    return sha256
+
+
+def output_files(outputs):
+    # Every file ComfyUI reports in a history entry, e.g. outputs[node]["images"]
+    for node_output in outputs.values():
+        for items in node_output.values():
+            if not isinstance(items, list):
+                continue
+            for item in items:
+                if isinstance(item, dict) and "filename" in item:
+                    yield item
+
+
+class ResultCache:
+    # Content-addressed store of whole workflow results. The key covers the
+    # rewritten workflow and the bytes of every input file it references, so a
+    # hit is only possible when ComfyUI would be given exactly the same job.
+    lock = threading.Lock()
+
+    def __init__(self, path=RESULT_CACHE_PATH, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def key(self, workflow, input_directory):
+        nodes = {}
+        input_files = {}
+        for node_id, node in workflow.items():
+            if not isinstance(node, dict):
+                continue
+            # Titles and other UI metadata do not change what a node produces
+            nodes[node_id] = {k: v for k, v in node.items() if k != "_meta"}
+            for value in node.get("inputs", {}).values():
+                if isinstance(value, str) and value not in input_files:
+                    path = os.path.join(input_directory, value)
+                    if os.path.isfile(path):
+                        input_files[value] = input_file_sha256(path)
+
+        digest = hashlib.sha256()
+        digest.update(json.dumps(nodes, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+        digest.update(json.dumps(input_files, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def restore(self, key, output_directory, temp_directory):
+        # Files are copied aside and only renamed into place once all of them
+        # have been copied. An entry evicted mid-copy leaves nothing behind in
+        # the output directory for the fresh run to be numbered after.
+        entry_path = os.path.join(self.path, key)
+        copied = []
+        try:
+            with open(os.path.join(entry_path, ENTRY_FILE), "r") as f:
+                entry = json.load(f)
+            for item in output_files(entry["outputs"]):
+                directory = temp_directory if item.get("type") == "temp" else output_directory
+                relative_path = os.path.join(item.get("subfolder", ""), item["filename"])
+                destination = os.path.join(directory, relative_path)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                temp_path = f"{destination}.{uuid.uuid4().hex}.restore"
+                copied.append((temp_path, destination))
+                shutil.copy2(os.path.join(entry_path, item.get("type", "output"), relative_path), temp_path)
+            # The entry's mtime is its last use for LRU eviction
+            os.utime(os.path.join(entry_path, ENTRY_FILE))
+        except (OSError, KeyError, json.JSONDecodeError):
+            for temp_path, _ in copied:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            self.misses += 1
+            return None
+
+        for temp_path, destination in copied:
+            os.replace(temp_path, destination)
+
+        self.hits += 1
+        return entry["outputs"]
+
+    def store(self, key, outputs, output_directory, temp_directory):
+        entry_path = os.path.join(self.path, key)
+        if os.path.exists(entry_path):
+            return
+
+        staging_path = os.path.join(self.path, f".{key}.{uuid.uuid4().hex}")
+        size = 0
+        try:
+            for item in output_files(outputs):
+                directory = temp_directory if item.get("type") == "temp" else output_directory
+                relative_path = os.path.join(item.get("subfolder", ""), item["filename"])
+                destination = os.path.join(staging_path, item.get("type", "output"), relative_path)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                shutil.copy2(os.path.join(directory, relative_path), destination)
+                size += os.path.getsize(destination)
+
+            if size > self.max_bytes:
+                shutil.rmtree(staging_path)
+                return
+
+            os.makedirs(staging_path, exist_ok=True)
+            with open(os.path.join(staging_path, ENTRY_FILE), "w") as f:
+                json.dump({"outputs": outputs, "size": size, "created": time.time()}, f)
+
+            with ResultCache.lock:
+                self.evict(self.max_bytes - size)
+                if os.path.exists(entry_path):
+                    shutil.rmtree(staging_path)
+                else:
+                    os.replace(staging_path, entry_path)
+        except OSError as e:
+            print(f"⚠️  Could not cache result {key[:12]}: {e}")
+            shutil.rmtree(staging_path, ignore_errors=True)
+
+    def entries(self):
+        entries = []
+        if not os.path.exists(self.path):
+            return entries
+        for key in os.listdir(self.path):
+            entry_file = os.path.join(self.path, key, ENTRY_FILE)
+            if key.startswith(".") or not os.path.isfile(entry_file):
+                continue
+            try:
+                with open(entry_file, "r") as f:
+                    size = json.load(f)["size"]
+            except (OSError, KeyError, json.JSONDecodeError):
+                size = 0
+            entries.append((os.path.getmtime(entry_file), size, key))
+        return entries
+
+    def evict(self, budget):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= budget:
+                break
+            print(f"Evicting cached result {key[:12]}")
+            shutil.rmtree(os.path.join(self.path, key), ignore_errors=True)
+            total -= size
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
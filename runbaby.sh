@@ -2,9 +2,13 @@
 UUID=$(uuidgen)
 docker run -it --rm \
   -e REPLICATE_API_TOKEN \
+  -e WEIGHTS_STORE_PATH=/weights_store \
+  -v "$(pwd)/weights_store:/weights_store" \
   -v "$(pwd)/inputs:/inputs" \
   -v "$(pwd)/inputs/comfyui_full_workflow.json:/app/workflow.json" \
   -v "$(pwd)/final_outputs:/app/final_outputs" \
+  -v "$(pwd)/node_cache:/tmp/node_cache" \
+  -v "$(pwd)/input_cache:/tmp/input_cache" \
   lbbw-trikot-comfyui-cpu:latest \
   --workflow_json_file /app/workflow.json \
   --user_image /inputs/guy.png \
@@ -11,6 +11,9 @@ fi
 
 echo "Starting $NUM_JOBS parallel jobs..."
 
+# Every container shares one weights store, so each weight is downloaded once
+mkdir -p "$(pwd)/weights_store"
+
 # The main logic is wrapped in { ... } so that `time` measures the whole block
 {
   for i in $(seq 1 $NUM_JOBS)
@@ -19,6 +22,8 @@ echo "Starting $NUM_JOBS parallel jobs..."
     # Redirect output to /dev/null to keep the console clean
     docker run --rm \
       -e REPLICATE_API_TOKEN \
+      -e WEIGHTS_STORE_PATH=/weights_store \
+      -v "$(pwd)/weights_store:/weights_store" \
       -v "$(pwd)/inputs:/inputs" \
       -v "$(pwd)/lbbw/comfyui_merge_user_jersey.json:/app/workflow.json" \
       -v "$(pwd)/final_outputs/job_$i:/app/final_outputs" \
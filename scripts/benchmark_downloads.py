@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+"""
+Measures RangeDownloader throughput against a local HTTP server that
+supports range requests. The server can cap the rate of each connection,
+like a CDN does, to show how throughput scales with parallel ranges.
+
+    python scripts/benchmark_downloads.py --size_mb 512 --connection_mbps 100
+"""
+
+import os
+import io
+import sys
+import time
+import tarfile
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from range_downloader import RangeDownloader
+
+
+def make_handler(files, connection_bytes_per_second):
+    class RangeRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            body = files.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+
+            start, end = 0, len(body) - 1
+            range_header = self.headers.get("Range")
+            if range_header and range_header.startswith("bytes="):
+                first, _, last = range_header[6:].partition("-")
+                start = int(first)
+                end = min(int(last), len(body) - 1) if last else len(body) - 1
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+            else:
+                self.send_response(200)
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(end + 1 - start))
+            self.end_headers()
+
+            view = memoryview(body)[start : end + 1]
+            block = 256 * 1024
+            began = time.monotonic()
+            for offset in range(0, len(view), block):
+                self.wfile.write(view[offset : offset + block])
+                if connection_bytes_per_second:
+                    ahead = (offset + block) / connection_bytes_per_second - (time.monotonic() - began)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+    return RangeRequestHandler
+
+
+def make_tar(name, payload):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        info = tarfile.TarInfo(name)
+        info.size = len(payload)
+        tar.addfile(info, io.BytesIO(payload))
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RangeDownloader against a local server.")
+    parser.add_argument("--size_mb", type=int, default=256)
+    parser.add_argument("--connection_mbps", type=float, default=0, help="Per-connection cap in MB/s. 0 for none.")
+    parser.add_argument("--connections", type=str, default="1,2,4,8,16")
+    parser.add_argument("--chunk_mb", type=int, default=8)
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size_mb * 1024**2)
+    files = {
+        "/weights.safetensors": payload,
+        "/weights.safetensors.tar": make_tar("weights.safetensors", payload),
+    }
+    handler = make_handler(files, int(args.connection_mbps * 1024**2))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"{'mode':<10}{'connections':>12}{'seconds':>10}{'MB/s':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for connections in [int(c) for c in args.connections.split(",")]:
+            downloader = RangeDownloader(connections=connections, chunk_size=args.chunk_mb * 1024**2)
+            for mode in ["download", "extract"]:
+                destination = os.path.join(directory, mode)
+                start = time.time()
+                if mode == "download":
+                    downloader.download(f"{base_url}/weights.safetensors", destination)
+                    path = destination
+                else:
+                    downloader.extract(f"{base_url}/weights.safetensors.tar", destination)
+                    path = os.path.join(destination, "weights.safetensors")
+                elapsed = time.time() - start
+                with open(path, "rb") as f:
+                    if f.read() != payload:
+                        raise RuntimeError(f"{mode} with {connections} connections wrote the wrong bytes")
+                print(f"{mode:<10}{connections:>12}{elapsed:>10.2f}{args.size_mb / elapsed:>10.1f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -74,10 +74,7 @@ def write_supported_weights():
         for weight_type, weights in weight_lists.items():
             f.write(f"## {weight_type}\n\n")
             for weight in weights:
-                synonyms = []
-                for syn, canonical in weights_manifest.synonyms.items():
-                    if canonical == weight:
-                        synonyms.append(syn)
+                synonyms = weights_manifest.get_synonyms(weight)
                 if synonyms:
                     f.write(f"- {weight} (Also available as {', '.join(synonyms)})\n")
                 else:
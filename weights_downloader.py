@@ -1,7 +1,19 @@
-import subprocess
 import time
 import os
+import requests
+from concurrent.futures import ThreadPoolExecutor
 from weights_manifest import WeightsManifest
+from range_downloader import RangeDownloader, DOWNLOAD_MAX_CONNECTIONS
+from model_cache import ModelCache
+import weights_store
+
+# How many weights are fetched at once, and how many connections they split
+# between them. The shared RangeDownloader caps the connections open across
+# every call in the process, so concurrent jobs can't multiply this.
+WEIGHTS_DOWNLOAD_CONCURRENCY = int(os.getenv("WEIGHTS_DOWNLOAD_CONCURRENCY", "4"))
+WEIGHTS_DOWNLOAD_MAX_CONNECTIONS = int(
+    os.getenv("WEIGHTS_DOWNLOAD_MAX_CONNECTIONS", str(DOWNLOAD_MAX_CONNECTIONS or 16))
+)
 
 
 class WeightsDownloader:
@@ -18,9 +30,14 @@ class WeightsDownloader:
         ".patch",
     ]
 
-    def __init__(self):
-        self.weights_manifest = WeightsManifest()
-        self.weights_map = self.weights_manifest.weights_map
+    def __init__(self, weights_manifest=None, model_cache=None):
+        self.weights_manifest = weights_manifest or WeightsManifest.shared()
+        self.model_cache = model_cache or ModelCache.shared()
+
+    @property
+    def weights_map(self):
+        # Read through, so a refreshed manifest is picked up
+        return self.weights_manifest.weights_map
 
     def get_canonical_weight_str(self, weight_str):
         return self.weights_manifest.get_canonical_weight_str(weight_str)
@@ -29,43 +46,156 @@ class WeightsDownloader:
         return self.weights_manifest.get_weights_by_type(type)
 
     def download_weights(self, weight_str):
-        if weight_str in self.weights_map:
+        if self.weights_manifest.has_weight(weight_str):
+            weights_map = self.weights_map
             if self.weights_manifest.is_non_commercial_only(weight_str):
                 print(
                     f"⚠️  {weight_str} is for non-commercial use only. Unless you have obtained a commercial license.\nDetails: https://github.com/replicate/cog-comfyui/blob/main/weights_licenses.md"
                 )
 
-            if isinstance(self.weights_map[weight_str], list):
-                for weight in self.weights_map[weight_str]:
+            if isinstance(weights_map[weight_str], list):
+                for weight in weights_map[weight_str]:
                     self.download_if_not_exists(
                         weight_str, weight["url"], weight["dest"]
                     )
             else:
                 self.download_if_not_exists(
                     weight_str,
-                    self.weights_map[weight_str]["url"],
-                    self.weights_map[weight_str]["dest"],
+                    weights_map[weight_str]["url"],
+                    weights_map[weight_str]["dest"],
                 )
         else:
             raise ValueError(
                 f"{weight_str} unavailable. View the list of available weights: https://github.com/replicate/cog-comfyui/blob/main/supported_weights.md"
             )
 
+    def target_path(self, weight_str, dest):
+        return dest if dest.endswith(weight_str) else os.path.join(dest, weight_str)
+
     def check_if_file_exists(self, weight_str, dest):
-        if dest.endswith(weight_str):
-            path_string = dest
+        # A weight that fails verification is deleted and counts as missing,
+        # so it is downloaded again before the job needs it
+        path = self.target_path(weight_str, dest)
+        if not os.path.exists(path):
+            return False
+        problem = self.model_cache.verify(path)
+        if problem is None:
+            return True
+        print(f"⚠️  {weight_str} failed verification ({problem}), downloading it again")
+        self.model_cache.repair(path)
+        return False
+
+    def use_existing(self, weight_str, dest):
+        # True when the weight is already on disk, either at dest or in the
+        # shared weights store, in which case dest is linked to the store
+        target = self.target_path(weight_str, dest)
+        store_dest = weights_store.store_path(dest)
+        stored = self.target_path(weight_str, store_dest)
+        if not os.path.islink(target) and self.check_if_file_exists(weight_str, dest):
+            path = target
+        elif stored != target and self.check_if_file_exists(weight_str, store_dest):
+            path = stored
+            weights_store.link(stored, target)
         else:
-            path_string = os.path.join(dest, weight_str)
-        return os.path.exists(path_string)
+            return False
+        print(f"✅ {weight_str} exists in {dest if path == target else store_dest}")
+        self.model_cache.used(weight_str, path)
+        return True
+
+    def download_if_not_exists(self, weight_str, url, dest, connections=None):
+        if self.use_existing(weight_str, dest):
+            return
+
+        # One process or thread downloads each weight; the rest wait on its
+        # lock and then find the finished file
+        target = self.target_path(weight_str, dest)
+        store_dest = weights_store.store_path(dest)
+        stored = self.target_path(weight_str, store_dest)
+        with weights_store.weight_lock(stored, f"⏳ Waiting for {weight_str}, already downloading"):
+            if self.use_existing(weight_str, dest):
+                return
+            self.model_cache.missed()
+            files = WeightsDownloader.download(weight_str, url, store_dest, connections)
+            self.model_cache.added(weight_str, stored, files)
+        weights_store.link(stored, target)
+
+    def resolve_downloads(self, weight_strs):
+        # (weight_str, url, dest) for every file still missing, one per target
+        # path even when list entries of several weights share it
+        downloads = {}
+        for weight_str in weight_strs:
+            if not self.weights_manifest.has_weight(weight_str):
+                raise ValueError(
+                    f"{weight_str} unavailable. View the list of available weights: https://github.com/replicate/cog-comfyui/blob/main/supported_weights.md"
+                )
+            if self.weights_manifest.is_non_commercial_only(weight_str):
+                print(
+                    f"⚠️  {weight_str} is for non-commercial use only. Unless you have obtained a commercial license.\nDetails: https://github.com/replicate/cog-comfyui/blob/main/weights_licenses.md"
+                )
+            entries = self.weights_map[weight_str]
+            for entry in entries if isinstance(entries, list) else [entries]:
+                if self.use_existing(weight_str, entry["dest"]):
+                    continue
+                target = self.target_path(weight_str, entry["dest"])
+                downloads.setdefault(target, (weight_str, entry["url"], entry["dest"]))
+        return list(downloads.values())
+
+    @staticmethod
+    def remote_size(url):
+        try:
+            response = requests.head(url, allow_redirects=True, timeout=10)
+            return int(response.headers.get("Content-Length") or 0)
+        except (requests.exceptions.RequestException, ValueError):
+            return 0
 
-    def download_if_not_exists(self, weight_str, url, dest):
-        if self.check_if_file_exists(weight_str, dest):
-            print(f"✅ {weight_str} exists in {dest}")
+    def download_all(
+        self,
+        weight_strs,
+        concurrency=WEIGHTS_DOWNLOAD_CONCURRENCY,
+        max_connections=WEIGHTS_DOWNLOAD_MAX_CONNECTIONS,
+    ):
+        # Fetches every missing weight, several at a time and largest first,
+        # so the long downloads start straight away and the small ones fill
+        # in around them
+        downloads = self.resolve_downloads(weight_strs)
+        if not downloads:
             return
-        WeightsDownloader.download(weight_str, url, dest)
+
+        workers = max(1, min(concurrency, len(downloads)))
+        connections = max(1, max_connections // workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            sizes = list(executor.map(lambda d: self.remote_size(d[1]), downloads))
+            ordered = [d for _, d in sorted(zip(sizes, downloads), key=lambda x: -x[0])]
+            if any(sizes):
+                print(f"Downloading {len(ordered)} weights, {sum(sizes) / 1024**3:.2f}GB in total")
+            # Make room first, keeping everything this workflow needs
+            self.model_cache.reserve(sum(sizes), keep=weight_strs)
+            futures = [
+                executor.submit(self.download_if_not_exists, weight_str, url, dest, connections)
+                for weight_str, url, dest in ordered
+            ]
+        errors = [future.exception() for future in futures if future.exception()]
+        if errors:
+            raise errors[0]
 
     @staticmethod
-    def download(weight_str, url, dest):
+    def progress_printer(weight_str, step=25):
+        # Several weights download at once, so print every step percent
+        # rather than a progress bar
+        printed = [0]
+
+        def progress(done, total):
+            if not total:
+                return
+            percent = done * 100 // total
+            if percent >= printed[0] + step and percent < 100:
+                printed[0] = percent - percent % step
+                print(f"⏳ {weight_str} {printed[0]}% of {total / 1024**2:.2f}MB")
+
+        return progress
+
+    @staticmethod
+    def download(weight_str, url, dest, connections=None):
         if "/" in weight_str:
             subfolder = weight_str.rsplit("/", 1)[0]
             dest = os.path.join(dest, subfolder)
@@ -73,8 +203,11 @@ class WeightsDownloader:
 
         print(f"⏳ Downloading {weight_str} to {dest}")
         start = time.time()
-        subprocess.check_call(
-            ["pget", "--log-level", "warn", "-xf", url, dest], close_fds=False
+        files = RangeDownloader.shared().extract(
+            url,
+            dest,
+            progress=WeightsDownloader.progress_printer(weight_str),
+            connections=connections,
         )
         elapsed_time = time.time() - start
         try:
@@ -87,10 +220,25 @@ class WeightsDownloader:
             )
         except FileNotFoundError:
             print(f"✅ {weight_str} downloaded to {dest} in {elapsed_time:.2f}s")
+        return files
 
     def delete_weights(self, weight_str):
-        if weight_str in self.weights_map:
-            weight_path = os.path.join(self.weights_map[weight_str]["dest"], weight_str)
-            if os.path.exists(weight_path):
-                os.remove(weight_path)
-                print(f"Deleted {weight_path}")
+        entries = self.weights_map.get(weight_str)
+        if entries is None:
+            return
+        for entry in entries if isinstance(entries, list) else [entries]:
+            weight_path = self.target_path(weight_str, entry["dest"])
+            # A link into the weights store goes along with the shared copy.
+            # Both are deleted under the lock other workers download them with.
+            if os.path.islink(weight_path):
+                stored = os.readlink(weight_path)
+                with weights_store.weight_lock(stored):
+                    if os.path.exists(stored):
+                        os.remove(stored)
+                        print(f"Deleted {stored}")
+                    self.model_cache.removed(stored)
+            with weights_store.weight_lock(weight_path):
+                if os.path.lexists(weight_path):
+                    os.remove(weight_path)
+                    print(f"Deleted {weight_path}")
+                self.model_cache.removed(weight_path)
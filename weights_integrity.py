@@ -0,0 +1,77 @@
+import os
+import json
+import struct
+import hashlib
+
+SAFETENSORS_EXTENSIONS = [".safetensors", ".sft"]
+# safetensors refuses headers larger than this
+SAFETENSORS_MAX_HEADER_BYTES = 100 * 1024**2
+HASH_BLOCK_SIZE = 8 * 1024**2
+
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def safetensors_problem(path):
+    # A safetensors file is an 8 byte header length, a JSON header and the
+    # tensor data. The last tensor must end exactly at the end of the file,
+    # which catches truncated downloads without reading the data.
+    file_size = os.path.getsize(path)
+    if file_size < 8:
+        return "too short for a safetensors header"
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        if header_size > SAFETENSORS_MAX_HEADER_BYTES or 8 + header_size > file_size:
+            return f"header length {header_size} does not fit in {file_size} bytes"
+        try:
+            header = json.loads(f.read(header_size))
+        except ValueError:
+            return "header is not valid JSON"
+
+    data_size = 0
+    for name, tensor in header.items():
+        if name == "__metadata__":
+            continue
+        try:
+            data_size = max(data_size, tensor["data_offsets"][1])
+        except (TypeError, KeyError, IndexError):
+            return f"tensor {name} has no data offsets"
+    if 8 + header_size + data_size != file_size:
+        return f"{file_size} bytes, expected {8 + header_size + data_size} from the header"
+    return None
+
+
+def quick_problem(path, record=None):
+    # Returns None if the file looks intact, or what is wrong with it.
+    # record is what was noted at download: {"size": ..., "sha256": ...}
+    if not os.path.isfile(path):
+        return "missing"
+    if record and os.path.getsize(path) != record["size"]:
+        return f"{os.path.getsize(path)} bytes, expected {record['size']}"
+    if os.path.splitext(path)[1].lower() in SAFETENSORS_EXTENSIONS:
+        return safetensors_problem(path)
+    return None
+
+
+def full_problem(path, record=None):
+    problem = quick_problem(path, record)
+    if problem is None and record and record.get("sha256"):
+        if file_sha256(path) != record["sha256"]:
+            return "sha256 does not match the download"
+    return problem
+
+
+def weight_files(path):
+    # The files making up a weight, which can be a single file or a directory
+    if os.path.isfile(path):
+        return [path]
+    return [
+        os.path.join(root, filename)
+        for root, _, filenames in os.walk(path)
+        for filename in filenames
+    ]
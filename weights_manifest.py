@@ -1,65 +1,339 @@
-import subprocess
 import time
+import requests
 import os
 import json
+import uuid
+import hashlib
+import threading
+import config as config_module
+import custom_node_helper
 import custom_node_helpers as helpers
 from config import config
 
 USER_WEIGHTS_MANIFEST_PATH = config["USER_WEIGHTS_MANIFEST_PATH"]
 REMOTE_WEIGHTS_MANIFEST_URL = config["REMOTE_WEIGHTS_MANIFEST_URL"]
 REMOTE_WEIGHTS_MANIFEST_PATH = "updated_weights.json"
+REMOTE_WEIGHTS_MANIFEST_ETAG_PATH = "updated_weights.etag"
+# Seconds before the downloaded remote manifest is checked for changes again
+REMOTE_WEIGHTS_MANIFEST_MAX_AGE = float(
+    os.getenv("REMOTE_WEIGHTS_MANIFEST_MAX_AGE", "3600")
+)
+# Seconds before a failed refresh is retried, doubling up to the max age
+REMOTE_WEIGHTS_MANIFEST_RETRY_DELAY = 60
+# A weight missing from the manifest checks for a newer remote manifest,
+# unless one was fetched within this many seconds
+REMOTE_WEIGHTS_MANIFEST_MISS_MAX_AGE = float(
+    os.getenv("REMOTE_WEIGHTS_MANIFEST_MISS_MAX_AGE", "60")
+)
 WEIGHTS_MANIFEST_PATH = "weights.json"
 WEIGHTS_SYNONYMS_PATH = "weight_synonyms.json"
+# Compiled manifest, reused while none of the files it was built from change
+WEIGHTS_MANIFEST_SNAPSHOT_PATH = os.getenv(
+    "WEIGHTS_MANIFEST_SNAPSHOT_PATH", "/tmp/weights_manifest_snapshot.json"
+)
+SNAPSHOT_VERSION = 1
 BASE_URL = config["WEIGHTS_BASE_URL"]
 MODELS_PATH = config["MODELS_PATH"]
 
+NON_COMMERCIAL_WEIGHTS = frozenset(
+    [
+        "cocoamixxl_v4Stable.safetensors",
+        "copaxTimelessxlSDXL1_v8.safetensors",
+        "dreamshaperXL_sfwV2TurboDPMSDE.safetensors",
+        "dreamshaperXL_v21TurboDPMSDE.safetensors",
+        "epicrealismXL_v10.safetensors",
+        "GPEN-BFR-1024.onnx",
+        "GPEN-BFR-2048.onnx",
+        "GPEN-BFR-512.onnx",
+        "illustriousXL_v01.safetensors",
+        "inswapper_128.onnx",
+        "inswapper_128_fp16.onnx",
+        "MODILL_XL_0.27_RC.safetensors",
+        "proteus_v02.safetensors",
+        "RealVisXL_V3.0_Turbo.safetensors",
+        "RMBG-1.4/model.pth",
+        "sd_xl_turbo_1.0.safetensors",
+        "sd_xl_turbo_1.0_fp16.safetensors",
+        "sd3.5_large.safetensors",
+        "sd3.5_large_fp8_scaled.safetensors",
+        "sd3.5_large_turbo.safetensors",
+        "sd3_medium.safetensors",
+        "sd3_medium_incl_clips.safetensors",
+        "sd3_medium_incl_clips_t5xxlfp16.safetensors",
+        "sd3_medium_incl_clips_t5xxlfp8.safetensors",
+        "stable-cascade/effnet_encoder.safetensors",
+        "stable-cascade/stage_a.safetensors",
+        "stable-cascade/stage_b.safetensors",
+        "stable-cascade/stage_b_bf16.safetensors",
+        "stable-cascade/stage_b_lite.safetensors",
+        "stable-cascade/stage_b_lite_bf16.safetensors",
+        "stable-cascade/stage_c.safetensors",
+        "stable-cascade/stage_c_bf16.safetensors",
+        "stable-cascade/stage_c_lite.safetensors",
+        "stable-cascade/stage_c_lite_bf16.safetensors",
+        "stable_cascade_stage_b.safetensors",
+        "stable_cascade_stage_c.safetensors",
+        "SUPIR-v0F.ckpt",
+        "SUPIR-v0F_fp16.safetensors",
+        "SUPIR-v0Q.ckpt",
+        "SUPIR-v0Q_fp16.safetensors",
+        "svd.safetensors",
+        "svd_xt.safetensors",
+        "turbovisionxlSuperFastXLBasedOnNew_tvxlV32Bakedvae",
+    ]
+)
+
+
+def snapshot_sources():
+    # Everything the compiled manifest depends on, including the helpers that
+    # contribute to weights_map
+    helpers_directory = os.path.dirname(helpers.__file__)
+    return [
+        WEIGHTS_MANIFEST_PATH,
+        REMOTE_WEIGHTS_MANIFEST_PATH,
+        USER_WEIGHTS_MANIFEST_PATH,
+        WEIGHTS_SYNONYMS_PATH,
+        __file__,
+        config_module.__file__,
+        custom_node_helper.__file__,
+    ] + [
+        os.path.join(helpers_directory, filename)
+        for filename in sorted(os.listdir(helpers_directory))
+        if filename.endswith(".py")
+    ]
+
+
+def manifest_problem(manifest):
+    # Returns None for a manifest of weight type -> list of weight names,
+    # or what is wrong with it
+    if not isinstance(manifest, dict):
+        return f"expected an object, got {type(manifest).__name__}"
+    for key, weights in manifest.items():
+        if not isinstance(weights, list):
+            return f"{key} is not a list"
+        if not all(isinstance(weight, str) for weight in weights):
+            return f"{key} has entries that are not weight names"
+    return None
+
+
+def source_stats(sources):
+    stats = {}
+    for path in sources:
+        try:
+            stat = os.stat(path)
+            stats[path] = [stat.st_size, stat.st_mtime_ns]
+        except FileNotFoundError:
+            stats[path] = None
+    return stats
+
+
+def source_hashes(sources):
+    hashes = {}
+    for path in sources:
+        try:
+            with open(path, "rb") as f:
+                hashes[path] = hashlib.sha256(f.read()).hexdigest()
+        except FileNotFoundError:
+            hashes[path] = None
+    return hashes
+
 
 class WeightsManifest:
+    shared_instance = None
+    shared_lock = threading.Lock()
+
     @staticmethod
     def base_url():
         return BASE_URL
 
+    @classmethod
+    def shared(cls):
+        # One manifest per process; every WeightsDownloader uses it
+        with cls.shared_lock:
+            if cls.shared_instance is None:
+                cls.shared_instance = cls()
+            return cls.shared_instance
+
     def __init__(self):
         self.download_latest_weights_manifest = (
             os.getenv("DOWNLOAD_LATEST_WEIGHTS_MANIFEST", "false").lower() == "true"
         )
-        self.weights_manifest = self._load_weights_manifest()
-        self.synonyms = self._initialize_synonyms()
-        self.weights_map = self._initialize_weights_map()
+        self.refresh_lock = threading.Lock()
+        self.refreshed_at = 0
+        self._load()
 
-    def _load_weights_manifest(self):
+        # Startup goes ahead with the manifests already on disk; a newer
+        # remote manifest is swapped in when it arrives
         if self.download_latest_weights_manifest:
-            self._download_updated_weights_manifest()
-        return self._merge_manifests()
+            self.start_background_refresh()
 
-    def _download_updated_weights_manifest(self):
-        if not os.path.exists(REMOTE_WEIGHTS_MANIFEST_PATH):
-            print(
-                f"Downloading updated weights manifest from {REMOTE_WEIGHTS_MANIFEST_URL}"
+    def _load(self):
+        sources = snapshot_sources()
+        snapshot = self._load_snapshot(sources)
+        if snapshot:
+            weights_manifest = snapshot["weights_manifest"]
+            synonyms = snapshot["synonyms"]
+            weights_map = snapshot["weights_map"]
+        else:
+            weights_manifest = self._merge_manifests()
+            synonyms = self._initialize_synonyms()
+            weights_map = self._initialize_weights_map(weights_manifest)
+            self._write_snapshot(
+                source_stats(sources),
+                source_hashes(sources),
+                {
+                    "version": SNAPSHOT_VERSION,
+                    "weights_manifest": weights_manifest,
+                    "synonyms": synonyms,
+                    "weights_map": weights_map,
+                },
             )
-            start = time.time()
+
+        # weight type -> set of weights, alongside the ordered lists in
+        # weights_manifest, so membership checks are O(1)
+        weights_by_type = {
+            key: set(weights) for key, weights in weights_manifest.items()
+        }
+        # canonical weight -> its synonyms
+        synonyms_by_canonical = {}
+        for synonym, canonical in synonyms.items():
+            synonyms_by_canonical.setdefault(canonical, []).append(synonym)
+
+        # Everything is built before anything is replaced, and nothing is
+        # modified in place, so concurrent readers see one map or the other
+        self.weights_manifest = weights_manifest
+        self.synonyms = synonyms
+        self.weights_by_type = weights_by_type
+        self.synonyms_by_canonical = synonyms_by_canonical
+        self.weights_map = weights_map
+        self.version = getattr(self, "version", 0) + 1
+
+    def _load_snapshot(self, sources):
+        try:
+            with open(WEIGHTS_MANIFEST_SNAPSHOT_PATH, "r") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            return None
+
+        stats = source_stats(sources)
+        if snapshot.get("stats") != stats:
+            # Changed mtimes with identical content, e.g. after a fresh
+            # checkout, keep the snapshot
+            hashes = source_hashes(sources)
+            if snapshot.get("hashes") != hashes:
+                return None
+            snapshot["stats"] = stats
+            self._write_snapshot(stats, hashes, snapshot)
+        return snapshot
+
+    def _write_snapshot(self, stats, hashes, snapshot):
+        snapshot["stats"] = stats
+        snapshot["hashes"] = hashes
+        temp_path = f"{WEIGHTS_MANIFEST_SNAPSHOT_PATH}.{uuid.uuid4().hex}"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(temp_path, WEIGHTS_MANIFEST_SNAPSHOT_PATH)
+        except OSError as e:
+            print(f"⚠️  Could not write weights manifest snapshot: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def start_background_refresh(self):
+        thread = threading.Thread(target=self._refresh_loop, daemon=True)
+        thread.start()
+        return thread
+
+    def _refresh_loop(self):
+        # Keeps running whatever a refresh raises; failures are retried with
+        # a growing delay
+        retry_delay = REMOTE_WEIGHTS_MANIFEST_RETRY_DELAY
+        while True:
+            try:
+                try:
+                    age = time.time() - os.path.getmtime(REMOTE_WEIGHTS_MANIFEST_PATH)
+                except OSError:
+                    age = float("inf")
+                if age >= REMOTE_WEIGHTS_MANIFEST_MAX_AGE:
+                    self.refresh_remote_manifest()
+                    age = 0
+                delay = max(REMOTE_WEIGHTS_MANIFEST_MAX_AGE - age, 60)
+                retry_delay = REMOTE_WEIGHTS_MANIFEST_RETRY_DELAY
+            except Exception as e:
+                print(f"⚠️  Failed to refresh the weights manifest, retrying in {retry_delay:.0f}s: {e}")
+                delay = retry_delay
+                retry_delay = min(retry_delay * 2, max(REMOTE_WEIGHTS_MANIFEST_MAX_AGE, 60))
+            time.sleep(delay)
+
+    def has_weight(self, weight_str):
+        # The remote manifest may have gained a weight since it was last
+        # fetched, so a miss waits for a refresh already running, or starts
+        # one, before giving up
+        if weight_str in self.weights_map:
+            return True
+        if not self.download_latest_weights_manifest:
+            return False
+        try:
+            self.refresh_remote_manifest(max_age=REMOTE_WEIGHTS_MANIFEST_MISS_MAX_AGE)
+        except Exception as e:
+            print(f"⚠️  Failed to refresh the weights manifest: {e}")
+        return weight_str in self.weights_map
+
+    def refresh_remote_manifest(self, max_age=0):
+        # Skipped when the last refresh was under max_age seconds ago. One
+        # refresh runs at a time; callers arriving meanwhile wait for it.
+        with self.refresh_lock:
+            if time.time() - self.refreshed_at < max_age:
+                return False
             try:
-                subprocess.check_call(
-                    [
-                        "pget",
-                        "--log-level",
-                        "warn",
-                        "-f",
-                        REMOTE_WEIGHTS_MANIFEST_URL,
-                        REMOTE_WEIGHTS_MANIFEST_PATH,
-                    ],
-                    close_fds=False,
-                    timeout=5,
-                )
-                print(
-                    f"Downloading {REMOTE_WEIGHTS_MANIFEST_URL} took: {(time.time() - start):.2f}s"
-                )
-            except subprocess.CalledProcessError:
-                print(f"Failed to download {REMOTE_WEIGHTS_MANIFEST_URL}")
-                pass
-            except subprocess.TimeoutExpired:
-                print(f"Download from {REMOTE_WEIGHTS_MANIFEST_URL} timed out")
-                pass
+                return self._refresh_remote_manifest()
+            finally:
+                self.refreshed_at = time.time()
+
+    def _refresh_remote_manifest(self):
+        # Conditional GET against the ETag of the copy we have. A changed
+        # manifest is checked, written aside, renamed into place and the maps
+        # rebuilt and swapped in; readers keep the old maps until then.
+        # Raises if the manifest could not be fetched or is malformed.
+        headers = {}
+        try:
+            with open(REMOTE_WEIGHTS_MANIFEST_ETAG_PATH, "r") as f:
+                if os.path.exists(REMOTE_WEIGHTS_MANIFEST_PATH):
+                    headers["If-None-Match"] = f.read().strip()
+        except OSError:
+            pass
+
+        start = time.time()
+        response = requests.get(
+            REMOTE_WEIGHTS_MANIFEST_URL, headers=headers, timeout=10
+        )
+        if response.status_code == 304:
+            os.utime(REMOTE_WEIGHTS_MANIFEST_PATH)
+            return False
+        response.raise_for_status()
+        try:
+            manifest = response.json()
+        except ValueError as e:
+            raise ValueError(f"{REMOTE_WEIGHTS_MANIFEST_URL} is not valid JSON: {e}")
+        problem = manifest_problem(manifest)
+        if problem:
+            raise ValueError(f"{REMOTE_WEIGHTS_MANIFEST_URL} is not a weights manifest: {problem}")
+
+        temp_path = f"{REMOTE_WEIGHTS_MANIFEST_PATH}.{uuid.uuid4().hex}"
+        with open(temp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, REMOTE_WEIGHTS_MANIFEST_PATH)
+        if response.headers.get("ETag"):
+            with open(REMOTE_WEIGHTS_MANIFEST_ETAG_PATH, "w") as f:
+                f.write(response.headers["ETag"])
+        print(
+            f"Downloading {REMOTE_WEIGHTS_MANIFEST_URL} took: {(time.time() - start):.2f}s"
+        )
+
+        self._load()
+        return True
 
     def _merge_manifests(self):
         if os.path.exists(WEIGHTS_MANIFEST_PATH):
@@ -73,18 +347,25 @@ class WeightsManifest:
             USER_WEIGHTS_MANIFEST_PATH,
         ]
 
+        known_weights = {
+            key: set(weights) for key, weights in original_manifest.items()
+        }
+
         for manifest_path in manifests_to_merge:
             if os.path.exists(manifest_path):
                 with open(manifest_path, "r") as f:
                     manifest_to_merge = json.load(f)
                     for key in manifest_to_merge:
                         if key in original_manifest:
+                            known = known_weights[key]
                             for item in manifest_to_merge[key]:
-                                if item not in original_manifest[key]:
+                                if item not in known:
                                     print(f"Adding {item} to {key}")
                                     original_manifest[key].append(item)
+                                    known.add(item)
                         else:
-                            original_manifest[key] = manifest_to_merge[key]
+                            original_manifest[key] = list(manifest_to_merge[key])
+                            known_weights[key] = set(manifest_to_merge[key])
 
         return original_manifest
 
@@ -97,7 +378,7 @@ class WeightsManifest:
             weight_str = weight_str[:-4] + ".safetensors"
         return self.synonyms.get(weight_str, weight_str)
 
-    def _initialize_weights_map(self):
+    def _initialize_weights_map(self, weights_manifest):
         weights_map = {}
 
         def generate_weights_map(keys, directory_name):
@@ -139,67 +420,27 @@ class WeightsManifest:
                 else:
                     weights_map[k] = v
 
-        for key in self.weights_manifest.keys():
-            map = generate_weights_map(self.weights_manifest[key], key)
+        for key in weights_manifest.keys():
+            map = generate_weights_map(weights_manifest[key], key)
             update_weights_map(map)
 
-        for module_name in dir(helpers):
-            module = getattr(helpers, module_name)
-            if hasattr(module, "weights_map"):
-                map = module.weights_map(BASE_URL)
-                update_weights_map(map)
+        for helper in helpers.helper_classes:
+            map = helper.weights_map(BASE_URL)
+            update_weights_map(map)
 
         return weights_map
 
     def non_commercial_weights(self):
-        return [
-            "cocoamixxl_v4Stable.safetensors",
-            "copaxTimelessxlSDXL1_v8.safetensors",
-            "dreamshaperXL_sfwV2TurboDPMSDE.safetensors",
-            "dreamshaperXL_v21TurboDPMSDE.safetensors",
-            "epicrealismXL_v10.safetensors",
-            "GPEN-BFR-1024.onnx",
-            "GPEN-BFR-2048.onnx",
-            "GPEN-BFR-512.onnx",
-            "illustriousXL_v01.safetensors",
-            "inswapper_128.onnx",
-            "inswapper_128_fp16.onnx",
-            "MODILL_XL_0.27_RC.safetensors",
-            "proteus_v02.safetensors",
-            "RealVisXL_V3.0_Turbo.safetensors",
-            "RMBG-1.4/model.pth",
-            "sd_xl_turbo_1.0.safetensors",
-            "sd_xl_turbo_1.0_fp16.safetensors",
-            "sd3.5_large.safetensors",
-            "sd3.5_large_fp8_scaled.safetensors",
-            "sd3.5_large_turbo.safetensors",
-            "sd3_medium.safetensors",
-            "sd3_medium_incl_clips.safetensors",
-            "sd3_medium_incl_clips_t5xxlfp16.safetensors",
-            "sd3_medium_incl_clips_t5xxlfp8.safetensors",
-            "stable-cascade/effnet_encoder.safetensors",
-            "stable-cascade/stage_a.safetensors",
-            "stable-cascade/stage_b.safetensors",
-            "stable-cascade/stage_b_bf16.safetensors",
-            "stable-cascade/stage_b_lite.safetensors",
-            "stable-cascade/stage_b_lite_bf16.safetensors",
-            "stable-cascade/stage_c.safetensors",
-            "stable-cascade/stage_c_bf16.safetensors",
-            "stable-cascade/stage_c_lite.safetensors",
-            "stable-cascade/stage_c_lite_bf16.safetensors",
-            "stable_cascade_stage_b.safetensors",
-            "stable_cascade_stage_c.safetensors",
-            "SUPIR-v0F.ckpt",
-            "SUPIR-v0F_fp16.safetensors",
-            "SUPIR-v0Q.ckpt",
-            "SUPIR-v0Q_fp16.safetensors",
-            "svd.safetensors",
-            "svd_xt.safetensors",
-            "turbovisionxlSuperFastXLBasedOnNew_tvxlV32Bakedvae",
-        ]
+        return NON_COMMERCIAL_WEIGHTS
 
     def is_non_commercial_only(self, weight_str):
-        return weight_str in self.non_commercial_weights()
+        return weight_str in NON_COMMERCIAL_WEIGHTS
 
     def get_weights_by_type(self, weight_type):
         return self.weights_manifest.get(weight_type, [])
+
+    def is_weight_of_type(self, weight_str, weight_type):
+        return weight_str in self.weights_by_type.get(weight_type, ())
+
+    def get_synonyms(self, weight_str):
+        return self.synonyms_by_canonical.get(weight_str, [])
@@ -0,0 +1,76 @@
+import os
+import uuid
+import fcntl
+import hashlib
+import threading
+from contextlib import contextmanager
+
+# A host directory mounted into every worker. Weights are downloaded into it
+# once and each worker links its own paths to the shared copy. Unset, every
+# worker keeps its weights to itself.
+WEIGHTS_STORE_PATH = os.getenv("WEIGHTS_STORE_PATH", "")
+WEIGHTS_LOCK_PATH = (
+    os.path.join(WEIGHTS_STORE_PATH, ".locks") if WEIGHTS_STORE_PATH else "/tmp/weights_locks"
+)
+
+# Lock files held by each thread. A thread that already holds a weight's
+# lock, such as one repairing the weight it is downloading, doesn't wait on
+# itself.
+held_locks = threading.local()
+
+
+def store_path(path):
+    # Where path lives in the store. Workers run from the same directory, so
+    # relative paths such as ComfyUI/models/... map to the same place.
+    if not WEIGHTS_STORE_PATH:
+        return path
+    return os.path.join(WEIGHTS_STORE_PATH, os.path.normpath(path).lstrip(os.sep))
+
+
+@contextmanager
+def file_lock(lock_path, waiting_message=None, blocking=True):
+    # Exclusive advisory lock, held across processes and across threads
+    # that open the lock file separately. Yields whether the lock is held,
+    # which is only False when blocking is off and someone else has it.
+    held = held_locks.__dict__.setdefault("paths", set())
+    if lock_path in held:
+        yield True
+        return
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    with open(lock_path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            if not blocking:
+                yield False
+                return
+            if waiting_message:
+                print(waiting_message)
+            fcntl.flock(f, fcntl.LOCK_EX)
+        held.add(lock_path)
+        try:
+            yield True
+        finally:
+            held.discard(lock_path)
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def weight_lock(path, waiting_message=None, blocking=True):
+    # Taken to download, repair or delete a weight. Lock files are kept
+    # apart from the weights, so ComfyUI never lists them.
+    name = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:32]
+    return file_lock(os.path.join(WEIGHTS_LOCK_PATH, f"{name}.lock"), waiting_message, blocking)
+
+
+def link(stored, path):
+    # Points path at the shared copy of a weight. The link is made aside
+    # and renamed over path, so readers see the old entry or the new link.
+    stored = os.path.abspath(stored)
+    if stored == os.path.abspath(path):
+        return
+    if os.path.islink(path) and os.readlink(path) == stored:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.link"
+    os.symlink(stored, temp_path)
+    os.replace(temp_path, path)
@@ -0,0 +1,139 @@
+import os
+import copy
+import json
+import hashlib
+from collections import OrderedDict
+from node import Node
+from input_cache import input_filename
+
+IMAGE_AND_VIDEO_FILETYPES = [".png", ".jpg", ".jpeg", ".webp", ".mp4", ".webm"]
+PLAN_CACHE_SIZE = 64
+# Their inputs are URLs or repos, not weights from the manifest
+REMOTE_WEIGHT_NODES = ["HFHubLoraLoader", "LoraLoaderFromURL"]
+
+
+def is_url(value):
+    return isinstance(value, str) and value.startswith(("http://", "https://"))
+
+
+def is_image_or_video_value(value):
+    return isinstance(value, str) and any(
+        value.lower().endswith(ft) for ft in IMAGE_AND_VIDEO_FILETYPES
+    )
+
+
+def workflow_hash(workflow):
+    payload = json.dumps(workflow, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class WorkflowPlan:
+    # Everything load_workflow needs to know about a workflow, worked out in
+    # one walk over its nodes
+    def __init__(self):
+        self.weights = []
+        # url -> filename it is saved as in the input directory
+        self.urls = {}
+        self.input_files = []
+        # node_id -> node after synonym, LoRA loader, URL and helper rewrites
+        self.rewritten_nodes = {}
+        self.errors = []
+
+    def apply(self, workflow):
+        for node_id, node in self.rewritten_nodes.items():
+            workflow[node_id] = copy.deepcopy(node)
+        return workflow
+
+
+class WorkflowAnalyzer:
+    def __init__(self, weights_downloader, apply_node_helper_methods):
+        self.weights_downloader = weights_downloader
+        self.apply_node_helper_methods = apply_node_helper_methods
+        self.plans = OrderedDict()
+
+    def analyze(self, workflow):
+        # Plans depend on the manifest's synonyms and embeddings too, so a
+        # refreshed manifest starts a fresh set of plans
+        key = (self.weights_downloader.weights_manifest.version, workflow_hash(workflow))
+        if key in self.plans:
+            self.plans.move_to_end(key)
+            return self.plans[key]
+
+        plan = self.build_plan(workflow)
+        self.plans[key] = plan
+        if len(self.plans) > PLAN_CACHE_SIZE:
+            self.plans.popitem(last=False)
+        return plan
+
+    def build_plan(self, workflow):
+        plan = WorkflowPlan()
+        embedding_to_fullname = self.embedding_names()
+        weights = []
+        input_files = set()
+
+        for node_id, original in workflow.items():
+            if not isinstance(original, dict):
+                continue
+            node = copy.deepcopy(original)
+
+            try:
+                self.apply_node_helper_methods("check_for_unsupported_nodes", Node(node))
+            except ValueError as e:
+                plan.errors.append(str(e))
+                continue
+
+            inputs = node.get("inputs", {})
+
+            # Input files and URLs. LoRA loaders take URLs that are weights,
+            # not inputs to download.
+            if node.get("class_type") not in ["LoraLoaderFromURL", "LoraLoader"]:
+                for input_key, input_value in inputs.items():
+                    if is_url(input_value):
+                        filename = input_filename(input_value)
+                        plan.urls[input_value] = filename
+                        inputs[input_key] = filename
+                    elif is_image_or_video_value(input_value):
+                        input_files.add(os.path.basename(input_value))
+
+            # LoraLoader nodes with a URL are handled by LoraLoaderFromURL
+            if node.get("class_type") == "LoraLoader" and is_url(inputs.get("lora_name")):
+                print("Converting LoraLoader node to LoraLoaderFromURL")
+                node["class_type"] = "LoraLoaderFromURL"
+                inputs["url"] = inputs.pop("lora_name")
+
+            # Weights
+            if node.get("class_type") not in REMOTE_WEIGHT_NODES:
+                self.apply_node_helper_methods("add_weights", weights, Node(node))
+                for input_key, input_value in inputs.items():
+                    if not isinstance(input_value, str):
+                        continue
+                    inputs[input_key], input_weights = self.input_weights(
+                        input_value, embedding_to_fullname
+                    )
+                    weights.extend(input_weights)
+
+            if node != original:
+                plan.rewritten_nodes[node_id] = node
+
+        plan.weights = list(dict.fromkeys(weights))
+        plan.input_files = sorted(input_files)
+        return plan
+
+    def embedding_names(self):
+        embeddings = self.weights_downloader.get_weights_by_type("EMBEDDINGS")
+        return {emb.split(".")[0]: emb for emb in embeddings}
+
+    def input_weights(self, value, embedding_to_fullname):
+        # Returns the input value, with a model synonym replaced by its
+        # canonical name, and the weights it refers to
+        matching_embeddings = [
+            embedding_to_fullname[key] for key in embedding_to_fullname if key in value
+        ]
+        if matching_embeddings:
+            return value, matching_embeddings
+        if value.endswith(tuple(self.weights_downloader.supported_filetypes)):
+            weight_str = self.weights_downloader.get_canonical_weight_str(value)
+            if weight_str != value:
+                print(f"Converting model synonym {value} to {weight_str}")
+            return weight_str, [weight_str]
+        return value, []
@@ -0,0 +1,111 @@
+import copy
+from workflow_analyzer import REMOTE_WEIGHT_NODES, WorkflowPlan, is_url, is_image_or_video_value
+from input_cache import input_filename
+from node_cache import is_link
+from node import Node
+
+
+class WorkflowTemplate:
+    # A workflow that has already been through analysis: unsupported nodes
+    # rejected, synonyms, LoRA loaders and URLs rewritten, weights resolved.
+    # Jobs only change a few inputs, so instantiate patches those into a
+    # shallow copy instead of parsing and analyzing the whole graph again.
+    #
+    # Slots are addressed by name, either one given to the constructor or
+    # "<node_id>.<input>" for any literal input, e.g. "231.seed".
+    #
+    # A slot can name a different weight than the one compiled in, so slot
+    # values go through the analyzer's weight lookup as well.
+    def __init__(self, workflow, plan, analyzer, slots=None):
+        self.workflow = workflow
+        self.analyzer = analyzer
+        self.weights = list(plan.weights)
+        self.url_by_filename = {filename: url for url, filename in plan.urls.items()}
+        self.input_files = set(plan.input_files)
+
+        # (node_id, input) -> filename, for every input that names a file
+        self.file_inputs = {}
+        for node_id, node in workflow.items():
+            if not isinstance(node, dict):
+                continue
+            for input_key, value in node.get("inputs", {}).items():
+                if isinstance(value, str) and (
+                    value in self.url_by_filename or value in self.input_files
+                ):
+                    self.file_inputs[(node_id, input_key)] = value
+
+        self.slots = {}
+        for name, (node_id, input_key) in (slots or {}).items():
+            self.slots[name] = self.validate_slot(name, node_id, input_key)
+
+    def validate_slot(self, name, node_id, input_key):
+        node = self.workflow.get(node_id)
+        if not isinstance(node, dict):
+            raise ValueError(f"Slot {name} refers to node {node_id}, which is not in the workflow")
+        inputs = node.get("inputs", {})
+        if input_key not in inputs:
+            raise ValueError(f"Slot {name} refers to {node_id}.{input_key}, which is not an input of {node.get('class_type')}")
+        if is_link(inputs[input_key]):
+            raise ValueError(f"Slot {name} refers to {node_id}.{input_key}, which is linked to another node")
+        return node_id, input_key
+
+    def slot(self, name):
+        if name in self.slots:
+            return self.slots[name]
+        node_id, _, input_key = name.partition(".")
+        self.slots[name] = self.validate_slot(name, node_id, input_key)
+        return self.slots[name]
+
+    def instantiate(self, values=None):
+        # Returns the workflow to queue and the plan of inputs and weights it
+        # needs. Only the patched nodes are copied; the rest are shared with
+        # the template and must not be modified in place.
+        workflow = dict(self.workflow)
+        file_inputs = dict(self.file_inputs)
+        plan = WorkflowPlan()
+        plan.weights = list(self.weights)
+        embedding_to_fullname = None
+
+        for name, value in (values or {}).items():
+            node_id, input_key = self.slot(name)
+            default = self.workflow[node_id]["inputs"][input_key]
+            if isinstance(default, (int, float)) and not isinstance(default, bool):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    raise ValueError(f"Slot {name} expects a number, got {value!r}")
+            elif not isinstance(value, type(default)):
+                raise ValueError(f"Slot {name} expects {type(default).__name__}, got {value!r}")
+
+            file_inputs.pop((node_id, input_key), None)
+            if is_url(value):
+                filename = input_filename(value)
+                plan.urls[value] = filename
+                value = filename
+                file_inputs[(node_id, input_key)] = filename
+            elif is_image_or_video_value(value):
+                file_inputs[(node_id, input_key)] = value
+
+            if isinstance(value, str) and self.workflow[node_id].get("class_type") not in REMOTE_WEIGHT_NODES:
+                if embedding_to_fullname is None:
+                    embedding_to_fullname = self.analyzer.embedding_names()
+                value, weights = self.analyzer.input_weights(value, embedding_to_fullname)
+                plan.weights.extend(weights)
+
+            if workflow[node_id] is self.workflow[node_id]:
+                workflow[node_id] = copy.copy(workflow[node_id])
+                workflow[node_id]["inputs"] = dict(workflow[node_id]["inputs"])
+            workflow[node_id]["inputs"][input_key] = value
+
+        # Helpers pick weights from inputs such as presets and model names
+        for node_id in {self.slot(name)[0] for name in (values or {})}:
+            if workflow[node_id].get("class_type") not in REMOTE_WEIGHT_NODES:
+                self.analyzer.apply_node_helper_methods("add_weights", plan.weights, Node(workflow[node_id]))
+
+        slot_filenames = set(plan.urls.values())
+        for filename in set(file_inputs.values()):
+            if filename in self.url_by_filename:
+                plan.urls[self.url_by_filename[filename]] = filename
+            elif filename not in slot_filenames:
+                plan.input_files.append(filename)
+        plan.input_files.sort()
+        plan.weights = list(dict.fromkeys(plan.weights))
+        return workflow, plan